@@ -0,0 +1,135 @@
+"""Coût de préparation des requêtes d'écriture : SQL construit à chaque requête contre cores.queries.
+
+Avant : chaque handler construisait `text(f"UPDATE ... SET {set_clause} ...")` à partir
+des clés du body, dans l'ordre envoyé par le client ; chaque ordre et chaque sous-ensemble
+de colonnes donne un texte SQL différent, donc un statement à préparer. Après :
+update_query / insert_query, colonnes triées par checked_columns et objets text() mis en cache.
+
+    python -m benchmarks.queries --requests 2000
+
+Sur la base configurée par PG_*, dans une transaction annulée à la fin (la base
+n'est pas modifiée). Chaque variante tourne sur une connexion neuve : son cache de
+statements préparés part vide.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import numpy as np
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+import database
+from cores.queries import insert_query, update_query
+
+PLAYER_COLUMNS = ("pseudo", "have_avatar", "avatar_url")
+MATCH_COLUMNS = ("t1j1", "t1j2", "t2j1", "t2j2", "terrain_name", "status")
+
+PREPARED_STATEMENTS_QUERY = text("SELECT count(*) FROM pg_prepared_statements")
+
+
+def player_body(rng: random.Random) -> dict:
+    # Sous-ensemble de colonnes dans un ordre quelconque, comme les bodies des clients
+    columns = rng.sample(PLAYER_COLUMNS, rng.randint(1, len(PLAYER_COLUMNS)))
+    values = {"pseudo": f"bench-{rng.randint(0, 999)}", "have_avatar": rng.random() < 0.5, "avatar_url": None}
+    return {column: values[column] for column in columns}
+
+
+def match_body(rng: random.Random) -> dict:
+    columns = rng.sample(MATCH_COLUMNS, rng.randint(1, len(MATCH_COLUMNS)))
+    values = {"terrain_name": f"Terrain {rng.randint(1, 8)}", "status": "Non commencé"}
+    return {column: values.get(column) for column in columns}
+
+
+def adhoc_update(body: dict):
+    set_clause = ", ".join([f"{key} = :{key}" for key in body.keys()])
+    return text(f"UPDATE playerz.players SET {set_clause} WHERE id = :id")
+
+
+def adhoc_insert(body: dict):
+    keys = ", ".join(body.keys())
+    values = ", ".join([f":{key}" for key in body.keys()])
+    return text(f"INSERT INTO playerz.matches ({keys}) VALUES ({values}) RETURNING id")
+
+
+def registry_update(body: dict):
+    return update_query("players", tuple(sorted(body)))
+
+
+def registry_insert(body: dict):
+    return insert_query("matches", tuple(sorted(body)), "id")
+
+
+VARIANTS = {
+    "adhoc": (adhoc_update, adhoc_insert),
+    "registry": (registry_update, registry_insert),
+}
+
+
+async def measure(engine, build_update, build_insert, requests: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    durations = []
+    texts = set()
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            player_id = (await conn.execute(
+                text("INSERT INTO playerz.players (pseudo) VALUES ('bench-queries') RETURNING id")
+            )).scalar()
+            for n in range(requests):
+                if n % 2:
+                    body = player_body(rng)
+                    statement, params = build_update(body), {**body, "id": player_id}
+                else:
+                    body = match_body(rng)
+                    statement, params = build_insert(body), body
+                started = time.perf_counter()
+                await conn.execute(statement, params)
+                durations.append(time.perf_counter() - started)
+                texts.add(statement.text)
+            prepared = (await conn.execute(PREPARED_STATEMENTS_QUERY)).scalar()
+        finally:
+            await transaction.rollback()
+
+    durations_ms = np.array(durations) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(durations_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(durations_ms, 99)), 3),
+        "mean_ms": round(float(durations_ms.mean()), 3),
+        "distinct_sql": len(texts),
+        "prepared_statements": prepared,
+    }
+
+
+async def run(args) -> dict:
+    # Sans pool : une connexion neuve (cache de statements vide) par variante
+    engine = create_async_engine(
+        database.DATABASE_URL,
+        poolclass=NullPool,
+        connect_args={"prepared_statement_cache_size": database.DB_STATEMENT_CACHE_SIZE},
+    )
+    try:
+        report = {"requests": args.requests, "statement_cache_size": database.DB_STATEMENT_CACHE_SIZE}
+        for name, (build_update, build_insert) in VARIANTS.items():
+            report[name] = await measure(engine, build_update, build_insert, args.requests, args.seed)
+        report["mean_speedup"] = round(report["adhoc"]["mean_ms"] / report["registry"]["mean_ms"], 2)
+        return report
+    finally:
+        await engine.dispose()
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
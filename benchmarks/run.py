@@ -0,0 +1,322 @@
+"""Benchmark des routes de l'API, exécutées en processus via ASGI.
+
+    python -m benchmarks.run --requests 200 --output bench.json
+    python -m benchmarks.run --baseline bench-previous.json
+
+Chaque endpoint est appelé `--requests` fois (avec `--concurrency` requêtes en
+parallèle) sur la base configurée par PG_*, remplie par benchmarks.seed. Le
+résultat (latences p50 / p99, requêtes SQL par appel, débit) est écrit en JSON
+pour être comparé d'une version à l'autre.
+
+Par défaut, seuls les endpoints qui ne modifient pas la base sont mesurés :
+deux lancements successifs portent sur le même jeu de données. `--writes`
+ajoute les écritures ; relancer ensuite benchmarks.seed --reset.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, UTC
+
+# Le cache de réponses masquerait le coût des routes : désactivé sauf --cache
+if "--cache" not in sys.argv:
+    os.environ["CACHE_ENABLED"] = "false"
+
+import httpx
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.sql import text
+
+import database
+import main as app_module
+from cores.warmup import warmup
+
+# Taille du tournoi créé par "tournaments.create_large" (création en inserts groupés)
+LARGE_TOURNAMENT_PLAYERS = 200
+LARGE_TOURNAMENT_SESSIONS = 20
+LARGE_TOURNAMENT_MATCHES = 2000
+
+
+def large_tournament(values: dict) -> dict:
+    players = values["tournament_player_ids"]
+    sessions = [f"S{n}" for n in range(LARGE_TOURNAMENT_SESSIONS)]
+    matches = []
+    for n in range(LARGE_TOURNAMENT_MATCHES):
+        # Quatre joueurs consécutifs de la liste : distincts dans un même match
+        t1j1, t1j2, t2j1, t2j2 = (players[(4 * n + k) % len(players)] for k in range(4))
+        matches.append({
+            "session_id": sessions[n % len(sessions)],
+            "t1j1": t1j1, "t1j2": t1j2, "t2j1": t2j1, "t2j2": t2j2,
+            "terrain_name": f"Terrain {n % 8 + 1}",
+        })
+    return {"name": "Benchmark", "players": players, "sessions": sessions, "matches": matches}
+
+
+# Mises à jour envoyées par "matches.scores_batch", à comparer au débit de "matches.score" (une par appel)
+SCORE_BATCH_SIZE = 50
+
+
+def score_batch(values: dict) -> list:
+    return [
+        {"match_id": match_id, "team": 1 + n % 2, "score": (values["score"] + n) % 22}
+        for n, match_id in enumerate(values["match_ids"])
+    ]
+
+
+# (nom, méthode, chemin, body) ; les {placeholders} sont tirés parmi les ids existants,
+# un body peut aussi être une fonction de ces valeurs
+ENDPOINTS = [
+    ("root", "GET", "/", None),
+    ("players.list", "GET", "/players/?limit=100", None),
+    ("players.get", "GET", "/players/{player_id}", None),
+    ("players.ratings", "GET", "/players/ratings?limit=50", None),
+    ("groupes.list", "GET", "/groupes/?limit=100", None),
+    ("groupes.get", "GET", "/groupes/{groupe_id}", None),
+    ("tournaments.list", "GET", "/tournaments/?limit=100", None),
+    ("tournaments.get", "GET", "/tournaments/{tournament_id}", None),
+    ("tournaments.snapshot", "GET", "/tournaments/{tournament_id}?snapshot=true", None),
+    ("tournaments.ranking", "GET", "/tournaments/{tournament_id}/ranking", None),
+    ("tournaments.get.not_modified", "GET", "/tournaments/{tournament_id}", None),
+    ("tournaments.ranking.not_modified", "GET", "/tournaments/{tournament_id}/ranking", None),
+    ("tournaments.sessions", "GET", "/tournaments/sessions/{tournament_id}/in-tournament", None),
+    ("matches.list", "GET", "/matches/?limit=100", None),
+    ("matches.get", "GET", "/matches/{match_id}", None),
+    ("matches.in_tournament", "GET", "/matches/{tournament_id}/in-tournament", None),
+    ("games.sessions", "GET", "/games/session/{tournament_id}", None),
+    ("games.organize_teams", "POST", "/games/organize_teams", {"player_ids": "{player_ids}", "balanced": True}),
+    (
+        "games.organize_sessions",
+        "POST",
+        "/games/organize_sessions",
+        {"team_codes": [f"T{n}" for n in range(16)], "num_sessions": 15, "matches_per_session": 8},
+    ),
+    ("matches.score", "PUT", "/matches/{match_id}/score/1", {"score": "{score}"}),
+    ("matches.scores_batch", "PUT", "/matches/scores", score_batch),
+    ("groupes.add_members", "POST", "/games/player/groupe/add_multiple", {"groupe_id": "{groupe_id}", "player_ids": "{player_ids}"}),
+    ("tournaments.create_large", "POST", "/tournaments/", large_tournament),
+]
+
+# Polling avec If-None-Match : l'ETag de chaque requête est lu avant la mesure, la
+# réponse attendue est un 304 (octets et CPU par appel à comparer à l'endpoint sans suffixe)
+NOT_MODIFIED_ENDPOINTS = {"tournaments.get.not_modified", "tournaments.ranking.not_modified"}
+
+# Endpoints qui modifient le jeu de données, mesurés seulement avec --writes
+WRITE_ENDPOINTS = {"matches.score", "matches.scores_batch", "groupes.add_members", "tournaments.create_large"}
+
+MAX_IDS_QUERY = text(
+    """
+    SELECT
+        (SELECT max(id) FROM playerz.players) AS player_id,
+        (SELECT max(id) FROM playerz.groupes) AS groupe_id,
+        (SELECT max(id) FROM playerz.tournaments) AS tournament_id,
+        (SELECT max(id) FROM playerz.matches) AS match_id
+    """
+)
+
+
+class QueryCounter:
+    """Nombre d'instructions SQL exécutées par les moteurs de l'application (primaire et réplicas)."""
+
+    def __init__(self, *engines):
+        self.count = 0
+        for engine in engines:
+            event.listen(engine.sync_engine, "before_cursor_execute", self.on_execute)
+
+    def on_execute(self, *args):
+        self.count += 1
+
+
+def fill(template, values: dict):
+    """Remplace les {placeholders} d'un chemin ou d'un body par des valeurs tirées au sort."""
+    if callable(template):
+        return template(values)
+    if isinstance(template, str):
+        if template.startswith("{") and template.endswith("}") and template[1:-1] in values:
+            return values[template[1:-1]]
+        return template.format(**values)
+    if isinstance(template, dict):
+        return {key: fill(value, values) for key, value in template.items()}
+    if isinstance(template, list):
+        return [fill(value, values) for value in template]
+    return template
+
+
+def draw_values(rng: random.Random, max_ids: dict) -> dict:
+    values = {name: rng.randint(1, max_id or 1) for name, max_id in max_ids.items()}
+    values["player_ids"] = [rng.randint(1, max_ids["player_id"] or 1) for _ in range(8)]
+    values["score"] = rng.randint(0, 21)
+    max_player_id = max_ids["player_id"] or 1
+    max_match_id = max_ids["match_id"] or 1
+    values["match_ids"] = rng.sample(range(1, max_match_id + 1), min(SCORE_BATCH_SIZE, max_match_id))
+    values["tournament_player_ids"] = rng.sample(range(1, max_player_id + 1), min(LARGE_TOURNAMENT_PLAYERS, max_player_id))
+    return values
+
+
+async def bench_endpoint(client, counter, endpoint, rng, max_ids, requests, concurrency) -> dict:
+    name, method, path, body = endpoint
+    latencies = []
+    statuses = {}
+    items = 0
+    body_bytes = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    calls = []
+    for _ in range(requests):
+        values = draw_values(rng, max_ids)
+        headers = {}
+        if name in NOT_MODIFIED_ENDPOINTS:
+            response = await client.request(method, fill(path, values))
+            headers["if-none-match"] = response.headers.get("etag", "")
+        calls.append((values, headers))
+
+    async def one(values: dict, headers: dict):
+        nonlocal items, body_bytes
+        payload = fill(body, values)
+        # Un body en liste (lot) compte pour autant d'éléments traités
+        items += len(payload) if isinstance(payload, list) else 1
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, fill(path, values), json=payload, headers=headers)
+            latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        body_bytes += len(response.content)
+
+    queries_before = counter.count
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    await asyncio.gather(*(one(values, headers) for values, headers in calls))
+    cpu = time.process_time() - cpu_started
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "method": method,
+        "path": path,
+        "requests": requests,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "queries_per_request": round((counter.count - queries_before) / requests, 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "items_per_second": round(items / elapsed, 1),
+        # Corps des réponses (bande passante) et temps CPU du processus par appel
+        "bytes_per_request": round(body_bytes / requests, 1),
+        "cpu_ms_per_request": round(cpu / requests * 1000, 3),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    counter = QueryCounter(database.engine, *(replica.engine for replica in database.replicas))
+    app = app_module.app
+
+    async with database.AsyncSessionLocal() as session:
+        max_ids = dict((await session.execute(MAX_IDS_QUERY)).one()._mapping)
+
+    endpoints = [endpoint for endpoint in ENDPOINTS if not args.only or endpoint[0] in args.only]
+    if not args.writes:
+        endpoints = [endpoint for endpoint in endpoints if endpoint[0] not in WRITE_ENDPOINTS]
+
+    results = {}
+    # Démarrage et arrêt de l'application comme sous uvicorn ; mesure une fois la chauffe terminée
+    async with app.router.lifespan_context(app):
+        await warmup.wait()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="https://bench") as client:
+            for endpoint in endpoints:
+                # Tours de chauffe non mesurés : connexions du pool, statements préparés
+                if args.warmup:
+                    await bench_endpoint(client, counter, endpoint, rng, max_ids, args.warmup, 1)
+                results[endpoint[0]] = await bench_endpoint(
+                    client, counter, endpoint, rng, max_ids, args.requests, args.concurrency
+                )
+                print(f"{endpoint[0]}: p50 {results[endpoint[0]]['p50_ms']} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(UTC).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": args.cache,
+            "writes": args.writes,
+            "seed": args.seed,
+            "dataset": max_ids,
+        },
+        "endpoints": results,
+    }
+
+
+def compare(report: dict, baseline: dict):
+    """Affiche l'écart de p50 / p99 / requêtes SQL par endpoint avec un rapport précédent."""
+    print(f"{'endpoint':28} {'p50 ms':>18} {'p99 ms':>18} {'queries':>12}", file=sys.stderr)
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous is None:
+            continue
+        columns = []
+        for key in ("p50_ms", "p99_ms"):
+            delta = (current[key] - previous[key]) / previous[key] * 100 if previous[key] else 0.0
+            columns.append(f"{current[key]:>9.2f} ({delta:+6.1f}%)")
+        queries = f"{previous['queries_per_request']:g}->{current['queries_per_request']:g}"
+        print(f"{name:28} {columns[0]:>18} {columns[1]:>18} {queries:>12}", file=sys.stderr)
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requêtes mesurées par endpoint")
+    parser.add_argument("--warmup", type=int, default=10, help="requêtes de chauffe par endpoint")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--only", nargs="*", help="noms des endpoints à mesurer (cf. ENDPOINTS)")
+    parser.add_argument(
+        "--writes", action="store_true", help="mesurer aussi les écritures (modifie la base : reseeder ensuite)"
+    )
+    parser.add_argument("--cache", action="store_true", help="garder le cache de réponses actif")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="fichier JSON de sortie (stdout par défaut)")
+    parser.add_argument("--baseline", help="rapport JSON précédent à comparer")
+    return parser.parse_args(argv)
+
+
+async def main(argv: list) -> int:
+    args = parse_args(argv)
+    try:
+        report = await run(args)
+    finally:
+        await database.engine.dispose()
+        for replica in database.replicas:
+            await replica.engine.dispose()
+    if args.writes:
+        print("Le jeu de données a été modifié : relancer benchmarks.seed --reset avant la prochaine mesure", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,53 @@
+"""Temps de génération des calendriers (cores.scheduling), sans base de données.
+
+    python -m benchmarks.scheduling --teams 512 --repeat 50
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from cores.scheduling import round_robin, split_into_sessions, swiss_pairing
+
+
+def timed(func, repeat: int) -> dict:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    durations_ms = np.array(durations) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(durations_ms, 50)), 3),
+        "max_ms": round(float(durations_ms.max()), 3),
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teams", type=int, nargs="*", default=[64, 512, 513])
+    parser.add_argument("--matches-per-session", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(42)
+    report = {}
+    for nb_teams in args.teams:
+        scores = rng.integers(0, 10, nb_teams)
+        rounds = round_robin(nb_teams)
+        report[nb_teams] = {
+            "round_robin": timed(lambda: round_robin(nb_teams), args.repeat),
+            "round_robin_sessions": timed(
+                lambda: split_into_sessions(round_robin(nb_teams), args.matches_per_session), args.repeat
+            ),
+            "swiss_round": timed(lambda: swiss_pairing(scores), args.repeat),
+            "matches": int(rounds.shape[0] * rounds.shape[1]),
+        }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,169 @@
+"""Jeu de données synthétique pour les benchmarks.
+
+    python -m benchmarks.seed --players 50000 --tournaments 1000 --matches 1000000 --reset
+
+Utilise la base configurée par PG_* (cf. database.py) : à lancer sur une base
+dédiée, jamais sur la production. Le schéma est créé par les migrations ; les
+données sont générées par PostgreSQL (generate_series) et sont identiques
+d'un lancement à l'autre pour une même graine et les mêmes tailles.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from sqlalchemy.sql import text
+
+import database
+from cores.migrations import migrate
+
+SEED_TABLES = (
+    "playerz.matches",
+    "playerz.sessions",
+    "playerz.tournament_players",
+    "playerz.tournaments",
+    "playerz.player_groupes",
+    "playerz.groupes",
+    "playerz.players",
+)
+
+# Joueur n° k (0 <= k < :per_tournament) du tournoi t : même formule pour
+# tournament_players et pour les matches, qui opposent donc des inscrits.
+# Des k distincts donnent des joueurs distincts (7919 premier avec :players)
+TOURNAMENT_PLAYER = "1 + ((({t})::bigint * :per_tournament + {k}) * 7919) % :players"
+
+SEED_STATEMENTS = (
+    (
+        "players",
+        """
+        INSERT INTO playerz.players (pseudo, have_avatar)
+        SELECT 'player_' || g, false FROM generate_series(1, :players) g
+        """,
+    ),
+    (
+        "groupes",
+        """
+        INSERT INTO playerz.groupes (name)
+        SELECT 'groupe_' || g FROM generate_series(1, :groupes) g
+        """,
+    ),
+    (
+        "player_groupes",
+        """
+        INSERT INTO playerz.player_groupes (player_id, groupe_id)
+        SELECT 1 + (g::bigint * 7919) % :players, 1 + g % :groupes
+        FROM generate_series(0, :memberships - 1) g
+        ON CONFLICT DO NOTHING
+        """,
+    ),
+    (
+        "tournaments",
+        """
+        INSERT INTO playerz.tournaments (name, status)
+        SELECT 'tournament_' || g, 'Terminé' FROM generate_series(1, :tournaments) g
+        """,
+    ),
+    (
+        "tournament_players",
+        f"""
+        INSERT INTO playerz.tournament_players (tournament_id, player_id)
+        SELECT DISTINCT t, {TOURNAMENT_PLAYER.format(t="t", k="k")}
+        FROM generate_series(1, :tournaments) t, generate_series(0, :per_tournament - 1) k
+        """,
+    ),
+    (
+        "sessions",
+        """
+        INSERT INTO playerz.sessions (tournament_id, reference)
+        SELECT 1 + (g - 1) / :sessions_per_tournament, 'S' || g
+        FROM generate_series(1, :sessions) g
+        """,
+    ),
+    (
+        "matches",
+        f"""
+        INSERT INTO playerz.matches
+            (session_id, t1j1, t1j2, t2j1, t2j2, terrain_name, status, score_team_one, score_team_two)
+        SELECT
+            session_id,
+            {TOURNAMENT_PLAYER.format(t="tournament_id", k="k")},
+            {TOURNAMENT_PLAYER.format(t="tournament_id", k="(k + step) % :per_tournament")},
+            {TOURNAMENT_PLAYER.format(t="tournament_id", k="(k + step + 1) % :per_tournament")},
+            {TOURNAMENT_PLAYER.format(t="tournament_id", k="(k + step + 2) % :per_tournament")},
+            'terrain_' || (g % 8),
+            CASE WHEN played THEN 'Terminé' ELSE 'Non commencé' END,
+            CASE WHEN played THEN floor(random() * 22)::int END,
+            CASE WHEN played THEN floor(random() * 22)::int END
+        FROM (
+            -- k, k + step, k + step + 1, k + step + 2 (modulo le nombre d'inscrits) :
+            -- quatre joueurs distincts tant que step reste entre 1 et inscrits - 3
+            SELECT g, session_id, 1 + (session_id - 1) / :sessions_per_tournament AS tournament_id,
+                floor(random() * :per_tournament)::int AS k,
+                1 + floor(random() * (:per_tournament - 3))::int AS step,
+                random() < :played_ratio AS played
+            FROM (
+                SELECT g, 1 + g % :sessions AS session_id
+                FROM generate_series(1, :matches) g
+            ) s
+        ) m
+        """,
+    ),
+)
+
+
+async def seed(params: dict, reset: bool = False) -> dict:
+    """Crée le schéma si besoin puis insère le jeu de données ; retourne la durée de chaque étape."""
+    await migrate()
+    timings = {}
+    async with database.engine.begin() as conn:
+        if not reset:
+            existing = (await conn.execute(text("SELECT count(*) FROM playerz.players"))).scalar()
+            if existing:
+                raise RuntimeError("La base contient déjà des joueurs : relancer avec --reset pour la vider")
+        await conn.execute(text(f"TRUNCATE {', '.join(SEED_TABLES)} RESTART IDENTITY CASCADE"))
+        await conn.execute(text("SELECT setseed(:seed)"), {"seed": params["seed"] / 2**31})
+
+        for name, statement in SEED_STATEMENTS:
+            started = time.perf_counter()
+            await conn.execute(text(statement), params)
+            timings[name] = round(time.perf_counter() - started, 3)
+            print(f"{name}: {timings[name]} s", file=sys.stderr)
+
+        # Statistiques à jour : les plans mesurés sont ceux d'une base en production
+        for table in SEED_TABLES:
+            await conn.execute(text(f"ANALYZE {table}"))
+    return timings
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--groupes", type=int, default=2_000)
+    parser.add_argument("--groupe-size", type=int, default=12)
+    parser.add_argument("--tournaments", type=int, default=1_000, help="avec --matches : 1 000 matches par tournoi")
+    parser.add_argument("--per-tournament", type=int, default=16, help="joueurs inscrits par tournoi")
+    parser.add_argument("--sessions-per-tournament", type=int, default=8)
+    parser.add_argument("--matches", type=int, default=1_000_000)
+    parser.add_argument("--played-ratio", type=float, default=0.9, help="part des matches avec un score")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="vider les tables playerz avant d'insérer")
+    args = parser.parse_args(argv)
+    if not 4 <= args.per_tournament <= args.players:
+        parser.error("--per-tournament doit être compris entre 4 et --players (quatre joueurs distincts par match)")
+    return args
+
+
+async def main(argv: list) -> int:
+    args = parse_args(argv)
+    params = {key: value for key, value in vars(args).items() if key != "reset"}
+    params["memberships"] = args.groupes * args.groupe_size
+    params["sessions"] = args.tournaments * args.sessions_per_tournament
+    try:
+        await seed(params, reset=args.reset)
+    finally:
+        await database.engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,112 @@
+"""Coût CPU et allocations de la sérialisation d'une réponse de N lignes, sans base de données.
+
+Compare le chemin par défaut de FastAPI (dict(zip(columns, row)), jsonable_encoder
+puis json.dumps) au chemin des routers (rows_to_dicts puis orjson).
+
+    python -m benchmarks.serialization --rows 100000 --repeat 5
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import DateTime, Numeric, create_engine, text
+
+from cores.serialization import dumps, rows_to_dicts
+
+# Colonnes d'un match, plus un Decimal pour couvrir les types non natifs en JSON
+ROWS_QUERY = text(
+    "SELECT id, session_id, t1j1, t1j2, t2j1, t2j2, score_team_one, score_team_two, "
+    "status, terrain_name, created_at, ratio FROM rows"
+).columns(created_at=DateTime, ratio=Numeric(10, 2, asdecimal=True))
+
+
+def load_rows(count: int):
+    """Lignes SQLAlchemy réelles (Row) lues depuis une table SQLite en mémoire."""
+    engine = create_engine("sqlite://")
+    started_at = datetime(2024, 1, 1)
+    with engine.connect() as conn:
+        conn.execute(text(
+            "CREATE TABLE rows (id INTEGER, session_id INTEGER, t1j1 INTEGER, t1j2 INTEGER, t2j1 INTEGER, "
+            "t2j2 INTEGER, score_team_one INTEGER, score_team_two INTEGER, status TEXT, terrain_name TEXT, "
+            "created_at TIMESTAMP, ratio NUMERIC)"
+        ))
+        conn.execute(
+            text("INSERT INTO rows VALUES (:id, :s, :a, :b, :c, :d, :x, :y, 'Terminé', :t, :at, :r)"),
+            [
+                {
+                    "id": i, "s": i // 8, "a": i % 997, "b": i % 991, "c": i % 983, "d": i % 977,
+                    "x": i % 21, "y": (i * 7) % 21, "t": f"Terrain {i % 12}",
+                    "at": str(started_at + timedelta(minutes=i)), "r": f"{i % 100 / 7:.2f}",
+                }
+                for i in range(count)
+            ],
+        )
+        result = conn.execute(ROWS_QUERY)
+        rows = result.fetchall()
+    return result, rows
+
+
+def fastapi_default(result, rows) -> bytes:
+    columns = result.keys()
+    content = {"message": "SUCCESS", "matches": [dict(zip(columns, row)) for row in rows]}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def orjson_path(result, rows) -> bytes:
+    return dumps({"message": "SUCCESS", "matches": rows_to_dicts(result, rows)})
+
+
+def measure(func, result, rows, repeat: int) -> dict:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func(result, rows)
+        durations.append(time.perf_counter() - started)
+
+    # Allocations mesurées à part : tracemalloc ralentit fortement l'exécution
+    tracemalloc.start()
+    func(result, rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations_ms = np.array(durations) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(durations_ms, 50)), 1),
+        "min_ms": round(float(durations_ms.min()), 1),
+        "peak_alloc_mb": round(peak / 1024 / 1024, 1),
+        "body_bytes": len(body),
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    result, rows = load_rows(args.rows)
+    if json.loads(fastapi_default(result, rows[:100])) != json.loads(orjson_path(result, rows[:100])):
+        print("Les deux chemins ne produisent pas le même JSON", file=sys.stderr)
+        return 1
+
+    baseline = measure(fastapi_default, result, rows, args.repeat)
+    optimized = measure(orjson_path, result, rows, args.repeat)
+    report = {
+        "rows": args.rows,
+        "fastapi_default": baseline,
+        "orjson": optimized,
+        "speedup": round(baseline["p50_ms"] / optimized["p50_ms"], 1),
+        "alloc_ratio": round(baseline["peak_alloc_mb"] / max(optimized["peak_alloc_mb"], 0.1), 1),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
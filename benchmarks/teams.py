@@ -0,0 +1,52 @@
+"""Qualité et temps de la répartition en équipes équilibrées (cores.teams), sans base de données.
+
+Compare balanced_pairs à l'appariement aléatoire (is_random) sur l'écart de force
+entre la meilleure et la moins bonne équipe.
+
+    python -m benchmarks.teams --players 1000 1001 --repeat 20
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from cores.teams import balanced_pairs, strength_gap
+
+
+def timed(func, repeat: int) -> tuple:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - started)
+    durations_ms = np.array(durations) * 1000
+    return result, {
+        "p50_ms": round(float(np.percentile(durations_ms, 50)), 3),
+        "max_ms": round(float(durations_ms.max()), 3),
+    }
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, nargs="*", default=[1000, 1001])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(42)
+    report = {}
+    for nb_players in args.players:
+        strengths = rng.normal(1000, 150, nb_players)
+        (pairs, _), timing = timed(lambda: balanced_pairs(strengths), args.repeat)
+        shuffled = rng.permutation(nb_players)[:nb_players // 2 * 2].reshape(-1, 2)
+        report[nb_players] = {
+            "balanced": {**timing, "strength_gap": round(strength_gap(strengths, pairs), 3)},
+            "random_strength_gap": round(strength_gap(strengths, shuffled), 3),
+        }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,281 @@
+import functools
+import hashlib
+import inspect
+import os
+import time
+from collections import OrderedDict
+
+import orjson
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database
+from cores.config import env_bool
+from cores.serialization import dumps
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_ENABLED = env_bool("CACHE_ENABLED", True)
+# Backend partagé entre workers ; par défaut le Redis de Socket.IO, qui signale plusieurs workers
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL") or os.getenv("SOCKETIO_REDIS_URL")
+
+MISSING = object()
+
+
+class MemoryBackend:
+    """LRU en mémoire borné en octets, avec expiration par entrée, et versions des tags.
+
+    Propre au processus : avec plusieurs workers, les invalidations d'un worker
+    ne valent pas pour les autres (cf. RedisBackend)."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        # Les versions repartent de 0 à chaque démarrage : les ETags portent aussi ce jeton
+        self.epoch = os.urandom(8).hex()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        # tag -> (version, date d'invalidation) ; jamais évincé, une entrée par tag
+        self.versions = {}
+
+    async def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self._delete(key)
+            return MISSING
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl: float, body: bytes):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        self._delete(key)
+        self.entries[key] = (time.monotonic() + ttl, size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size, _) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def _delete(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    async def tag_versions(self, tags: list) -> list:
+        return [self.versions.get(tag, (0, 0.0)) for tag in tags]
+
+    async def bump(self, tags: list):
+        for tag in tags:
+            version, _ = self.versions.get(tag, (0, 0.0))
+            # Heure murale : comparable entre workers pour un backend partagé
+            self.versions[tag] = (version + 1, time.time())
+
+    async def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    async def close(self):
+        pass
+
+
+class RedisBackend:
+    """Entrées et versions des tags dans Redis, partagées par tous les workers.
+
+    Les entrées sont stockées sérialisées et expirent avec leur TTL ; la mémoire
+    totale est bornée par la configuration de Redis (maxmemory). Redis injoignable :
+    la lecture passe à la base, sans cache."""
+
+    def __init__(self, url: str, max_bytes: int = CACHE_MAX_BYTES, prefix: str = "playerz:cache:"):
+        import redis.asyncio
+
+        # Versions partagées et persistantes : même ETag sur tous les workers et après un redémarrage
+        self.epoch = ""
+
+        # Délais courts : un Redis injoignable ne doit pas retenir les lectures
+        self.client = redis.asyncio.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        try:
+            body = await self.client.get(self.prefix + key)
+        except Exception as e:
+            print("Cache get failed : ", e)
+            return MISSING
+        return MISSING if body is None else orjson.loads(body)
+
+    async def set(self, key: str, value, ttl: float, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        try:
+            await self.client.set(self.prefix + key, body, px=int(ttl * 1000))
+        except Exception as e:
+            print("Cache set failed : ", e)
+
+    async def tag_versions(self, tags: list) -> list:
+        if not tags:
+            return []
+        values = await self.client.mget([f"{self.prefix}tag:{tag}:{field}" for tag in tags for field in ("version", "at")])
+        return [(int(values[i] or 0), float(values[i + 1] or 0)) for i in range(0, len(values), 2)]
+
+    async def bump(self, tags: list):
+        # MULTI / EXEC : version et date d'invalidation changent ensemble
+        async with self.client.pipeline(transaction=True) as pipe:
+            invalidated_at = time.time()
+            for tag in tags:
+                pipe.incr(f"{self.prefix}tag:{tag}:version")
+                pipe.set(f"{self.prefix}tag:{tag}:at", invalidated_at)
+            await pipe.execute()
+
+    async def clear(self):
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class ResponseCache:
+    """Cache des réponses de lecture, invalidé par tags lors des écritures.
+
+    Chaque tag a une version, gardée par le backend, et la clé d'une entrée
+    contient les versions de ses tags. Invalider un tag incrémente sa version :
+    les entrées qui en dépendent ne sont plus lues et finissent évincées."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+
+    async def get(self, key: str):
+        return await self.backend.get(key)
+
+    async def set(self, key: str, value, ttl: float = CACHE_TTL):
+        await self.backend.set(key, value, ttl, dumps(value))
+
+    @property
+    def epoch(self) -> str:
+        return self.backend.epoch
+
+    async def tag_versions(self, tags: list) -> list:
+        """(version, date d'invalidation) de chaque tag."""
+        return await self.backend.tag_versions(tags)
+
+    async def invalidate(self, *tags):
+        if not tags:
+            return
+        try:
+            await self.backend.bump(list(tags))
+        except Exception as e:
+            # L'écriture est déjà validée : les entrées de ces tags expirent avec leur TTL
+            print("Cache invalidation failed : ", e)
+
+    async def clear(self):
+        await self.backend.clear()
+
+    async def close(self):
+        await self.backend.close()
+
+
+response_cache = ResponseCache(RedisBackend(CACHE_REDIS_URL) if CACHE_REDIS_URL else None)
+
+
+def _may_be_stale(versions: list) -> bool:
+    # Juste après une écriture, un réplica peut encore renvoyer l'état précédent :
+    # ne pas le mettre en cache sous la nouvelle version
+    if not database.replicas:
+        return False
+    since = time.time() - database.DB_READ_YOUR_WRITES_SECONDS
+    return any(invalidated_at > since for _, invalidated_at in versions)
+
+
+def _route_params(kwargs: dict) -> dict:
+    return {name: value for name, value in kwargs.items() if not isinstance(value, AsyncSession)}
+
+
+def cached(*tag_templates: str, ttl: float = CACHE_TTL):
+    """Met en cache la réponse d'une route de lecture.
+
+    La clé est construite à partir de la route et de ses paramètres (hors
+    session de base de données) ; les tags acceptent ces paramètres, par
+    exemple "tournament:{id}". Les réponses d'erreur, les réponses qui ne
+    sont pas des dict (streaming) et celles qui dépassent à elles seules
+    CACHE_MAX_BYTES ne sont pas mises en cache."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED:
+                return await func(*args, **kwargs)
+
+            params = _route_params(kwargs)
+            # Versions lues avant d'exécuter la route : une écriture concurrente
+            # range la réponse sous une clé qui ne sera plus demandée
+            try:
+                versions = await response_cache.tag_versions([tag.format(**params) for tag in tag_templates])
+            except Exception as e:
+                print("Cache unavailable : ", e)
+                return await func(*args, **kwargs)
+            key = (
+                f"{func.__module__}.{func.__name__}:{sorted(params.items())!r}"
+                f"@{'.'.join(str(version) for version, _ in versions)}"
+            )
+            value = await response_cache.get(key)
+            if value is not MISSING:
+                return value
+
+            value = await func(*args, **kwargs)
+            if isinstance(value, dict) and "error" not in value and not _may_be_stale(versions):
+                await response_cache.set(key, value, ttl)
+            return value
+
+        # Lus par @conditional, placé au-dessus
+        wrapper.cache_tags = tag_templates
+        return wrapper
+
+    return decorator
+
+
+def conditional(func):
+    """Ajoute un ETag aux réponses d'une route de lecture et répond 304 si If-None-Match correspond.
+
+    L'ETag est dérivé de la route, de ses paramètres et des versions des tags de
+    son @cached, placé en dessous : il est vérifié avant d'exécuter la route, un
+    304 ne reconstruit ni ne sérialise la réponse. Toute écriture qui change la
+    réponse doit donc invalider l'un de ses tags."""
+    signature = inspect.signature(func)
+    tag_templates = func.cache_tags
+
+    @functools.wraps(func)
+    async def wrapper(*args, request: Request, **kwargs):
+        params = _route_params(kwargs)
+        etag = None
+        try:
+            versions = await response_cache.tag_versions([tag.format(**params) for tag in tag_templates])
+        except Exception as e:
+            print("Cache unavailable : ", e)
+            versions = None
+        # Juste après une écriture, la réponse peut venir d'un réplica en retard : pas d'ETag
+        if versions is not None and not _may_be_stale(versions):
+            token = (
+                f"{func.__module__}.{func.__name__}:{sorted(params.items())!r}"
+                f"@{response_cache.epoch}.{'.'.join(str(version) for version, _ in versions)}"
+            )
+            etag = f'"{hashlib.blake2b(token.encode(), digest_size=16).hexdigest()}"'
+            if_none_match = request.headers.get("if-none-match")
+            if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+                return Response(status_code=304, headers={"etag": etag})
+
+        value = await func(*args, **kwargs)
+        if etag is None or isinstance(value, Response) or not isinstance(value, dict) or "error" in value:
+            return value
+        # Versions lues avant la route : une écriture concurrente change l'ETag suivant, pas celui-ci
+        return Response(dumps(value), media_type="application/json", headers={"etag": etag})
+
+    wrapper.__signature__ = signature.replace(parameters=[
+        *signature.parameters.values(),
+        inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+    ])
+    return wrapper
@@ -0,0 +1,17 @@
+import os
+import time
+
+from dotenv import load_dotenv
+
+# Début du démarrage du processus (premier module importé), pour mesurer le démarrage à froid
+PROCESS_STARTED = time.perf_counter()
+
+# Fichier .env chargé une seule fois, avant que les modules lisent leur configuration
+load_dotenv()
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,51 @@
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import cookie_parser
+
+import database
+
+READ_YOUR_WRITES_COOKIE = "playerz_primary_until"
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class ReadYourWritesMiddleware:
+    """Après une écriture réussie, les lectures du même client vont au primaire.
+
+    La réponse à l'écriture pose un cookie valable DB_READ_YOUR_WRITES_SECONDS ;
+    tant qu'il est présent, get_read_db ne choisit pas de réplica, dont le
+    retard de réplication pourrait masquer l'écriture. Sans réplica configuré
+    le middleware ne fait rien."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not database.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        cookies = cookie_parser(Headers(scope=scope).get("cookie", ""))
+        try:
+            primary_until = float(cookies.get(READ_YOUR_WRITES_COOKIE, 0))
+        except ValueError:
+            primary_until = 0.0
+        token = database.prefer_primary.set(primary_until > time.time())
+
+        is_write = scope["method"] in WRITE_METHODS
+
+        async def send_wrapper(message):
+            if is_write and message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + database.DB_READ_YOUR_WRITES_SECONDS
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{READ_YOUR_WRITES_COOKIE}={until:.3f}; Max-Age={int(database.DB_READ_YOUR_WRITES_SECONDS) + 1}; "
+                    "Path=/; HttpOnly; Secure; SameSite=None",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            database.prefer_primary.reset(token)
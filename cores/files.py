@@ -0,0 +1,97 @@
+import mimetypes
+import os
+import re
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from hashlib import md5
+
+# Fichiers nommés par le hash de leur contenu (cf. cores/storage.py) et leurs
+# déclinaisons (cf. cores/images.py) : jamais modifiés
+CONTENT_ADDRESSED_NAME = re.compile(r"^(?P<hash>[0-9a-f]{64}(?:_\d+)?)(?:\.[A-Za-z0-9]+)?$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MUTABLE_CACHE_CONTROL = "public, max-age=300"
+
+FILE_METADATA_CACHE_SIZE = int(os.getenv("FILE_METADATA_CACHE_SIZE", "1024"))
+# Durée de validité des métadonnées d'un fichier non adressé par son contenu
+FILE_METADATA_TTL = 60.0
+
+
+class FileMetadata:
+    def __init__(self, path: str, stat_result: os.stat_result, immutable: bool, content_hash: str = None):
+        self.path = path
+        self.stat_result = stat_result
+        self.immutable = immutable
+        media_type, _ = mimetypes.guess_type(path)
+        self.media_type = media_type or "application/octet-stream"
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        if content_hash is not None:
+            self.etag = f'"{content_hash}"'
+        else:
+            etag_base = f"{stat_result.st_mtime}-{stat_result.st_size}"
+            self.etag = f'"{md5(etag_base.encode(), usedforsecurity=False).hexdigest()}"'
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else MUTABLE_CACHE_CONTROL
+        self.loaded_at = time.monotonic()
+
+    def headers(self) -> dict:
+        return {
+            "etag": self.etag,
+            "last-modified": self.last_modified,
+            "cache-control": self.cache_control,
+            "accept-ranges": "bytes",
+        }
+
+
+class FileMetadataCache:
+    """LRU des métadonnées (stat, type MIME, ETag) des fichiers servis."""
+
+    def __init__(self, max_size: int = FILE_METADATA_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, path: str):
+        """Métadonnées du fichier, ou None s'il n'existe pas."""
+        meta = self.entries.get(path)
+        if meta is not None:
+            if meta.immutable or time.monotonic() - meta.loaded_at < FILE_METADATA_TTL:
+                self.entries.move_to_end(path)
+                return meta
+            del self.entries[path]
+
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        match = CONTENT_ADDRESSED_NAME.match(os.path.basename(path))
+        meta = FileMetadata(path, stat_result, match is not None, match.group("hash") if match else None)
+        self.entries[path] = meta
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return meta
+
+    def discard(self, path: str):
+        self.entries.pop(path, None)
+
+
+def is_not_modified(request_headers, meta: FileMetadata) -> bool:
+    """Vrai si la requête conditionnelle permet de répondre 304."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or meta.etag in tags
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(meta.stat_result.st_mtime) <= since
+    return False
+
+
+file_metadata_cache = FileMetadataCache()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Tailles (côté max en pixels) des déclinaisons générées pour chaque image
+AVATAR_SIZES = (64, 256, 512)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_executor = None
+_pending = set()
+# Images dont les déclinaisons sont en cours de génération
+_in_flight = set()
+
+
+def variant_filename(filename: str, size: int) -> str:
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}_{size}{extension}"
+
+
+def generate_derivatives(path: str) -> list:
+    """Génère les déclinaisons d'une image (réencodées, sans métadonnées EXIF).
+
+    Exécuté dans un processus du pool : ne doit pas dépendre de l'état de l'application."""
+    directory, filename = os.path.split(path)
+    targets = [(size, os.path.join(directory, variant_filename(filename, size))) for size in AVATAR_SIZES]
+    targets = [(size, target) for size, target in targets if not os.path.exists(target)]
+    if not targets:
+        return []
+
+    created = []
+    with Image.open(path) as source:
+        image_format = source.format
+        image = ImageOps.exif_transpose(source)
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        for size, target in targets:
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            # Fichier temporaire propre à cet appel, renommé atomiquement une fois complet
+            fd, tmp_target = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(target)[1])
+            try:
+                with os.fdopen(fd, "wb") as tmp_file:
+                    if image_format == "JPEG":
+                        variant.save(tmp_file, "JPEG", quality=85, optimize=True, progressive=True)
+                    else:
+                        variant.save(tmp_file, image_format, optimize=True)
+                os.replace(tmp_target, target)
+            except BaseException:
+                if os.path.exists(tmp_target):
+                    os.remove(tmp_target)
+                raise
+            created.append(target)
+    return created
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def schedule_derivatives(path: str):
+    """Lance la génération des déclinaisons en arrière-plan, sans bloquer la requête.
+
+    Une seule génération à la fois par image : les demandes concurrentes (plusieurs
+    lectures d'une déclinaison absente) ne relancent rien tant qu'elle est en cours."""
+    if path in _in_flight:
+        return None
+    loop = asyncio.get_running_loop()
+    task = loop.run_in_executor(get_executor(), generate_derivatives, path)
+    _pending.add(task)
+    _in_flight.add(path)
+
+    def done(future):
+        _pending.discard(future)
+        _in_flight.discard(path)
+        if not future.cancelled() and future.exception() is not None:
+            print("Image derivatives failed : ", future.exception())
+
+    task.add_done_callback(done)
+    return task
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
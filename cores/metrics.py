@@ -0,0 +1,187 @@
+import contextvars
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+
+from cores.config import env_bool
+
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Statistiques SQL de la requête HTTP en cours (propagées jusqu'aux hooks SQLAlchemy)
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_time")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_time = 0.0
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return route.path if route is not None else "unmatched"
+
+
+class Histogram:
+    """Histogramme Prometheus à buckets fixes, une série par jeu de labels."""
+
+    def __init__(self, name: str, help_text: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, label_values: tuple, value: float):
+        series = self.series.get(label_values)
+        if series is None:
+            # [compteurs par bucket (+Inf en dernier), somme, nombre]
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self.series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+            lines.append(f"{_series(self.name + '_sum', labels)} {total}")
+            lines.append(f"{_series(self.name + '_count', labels)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, label_values: tuple = (), amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{_series(self.name, _labels(self.labels, label_values))} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _series(name: str, labels: str) -> str:
+    return f"{name}{{{labels}}}" if labels else name
+
+
+http_requests = Counter("playerz_http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status"))
+http_latency = Histogram(
+    "playerz_http_request_duration_seconds", "Durée des requêtes HTTP", ("method", "route"), LATENCY_BUCKETS
+)
+request_statements = Histogram(
+    "playerz_db_statements_per_request", "Instructions SQL par requête HTTP", ("method", "route"), STATEMENT_BUCKETS
+)
+request_db_time = Histogram(
+    "playerz_db_time_per_request_seconds", "Temps passé en base par requête HTTP", ("method", "route"), LATENCY_BUCKETS
+)
+db_statements = Counter("playerz_db_statements_total", "Instructions SQL exécutées")
+db_time = Counter("playerz_db_time_seconds_total", "Temps cumulé des instructions SQL")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    _record_statement(time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if starts:
+        _record_statement(time.perf_counter() - starts.pop())
+
+
+def _record_statement(elapsed: float):
+    db_statements.inc()
+    db_time.inc(amount=elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += elapsed
+
+
+def instrument_engine(engine):
+    """Branche les hooks de comptage SQL sur un moteur (AsyncEngine)."""
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : latence, nombre d'instructions SQL et temps en base par route.
+
+    Les routes sont identifiées par leur modèle de chemin ("/matches/{id}") pour
+    que le nombre de séries reste borné."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            labels = (scope["method"], stats.route)
+            http_requests.inc((*labels, status_code))
+            http_latency.observe(labels, elapsed)
+            request_statements.observe(labels, stats.statements)
+            request_db_time.observe(labels, stats.db_time)
+
+
+def render_metrics(pool_status: dict = None) -> str:
+    lines = []
+    for metric in (http_requests, http_latency, request_statements, request_db_time, db_statements, db_time):
+        lines.extend(metric.render())
+    for name, value in (pool_status or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f"# TYPE playerz_db_pool_{name} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"playerz_db_pool_{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,157 @@
+"""Migrations versionnées du schéma playerz.
+
+    python -m cores.migrations            applique les migrations en attente
+    python -m cores.migrations --status   liste les migrations appliquées / en attente
+    python -m cores.migrations --explain  vérifie que les requêtes fréquentes utilisent un index
+"""
+import asyncio
+import os
+import re
+import sys
+
+from sqlalchemy.sql import text
+
+import database
+from routes.groupes import GROUPES_PLAYERS_QUERY
+from routes.tournaments import (
+    TOURNAMENT_BY_ID_QUERY,
+    TOURNAMENT_MATCH_IDS_QUERY,
+    TOURNAMENT_MATCHES_QUERY,
+    TOURNAMENT_PLAYERS_QUERY,
+    TOURNAMENT_SESSIONS_QUERY,
+)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATION_FILE = re.compile(r"^(?P<version>\d+)_(?P<name>\w+)\.sql$")
+
+# Clé du verrou consultatif : un seul processus applique les migrations à la fois
+MIGRATION_LOCK_ID = 7_251_004
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE SCHEMA IF NOT EXISTS playerz;
+    CREATE TABLE IF NOT EXISTS playerz.schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+# Requêtes fréquentes des routes (les constantes qu'elles exécutent), avec des paramètres d'exemple
+HOT_QUERIES = {
+    "tournament by id": (TOURNAMENT_BY_ID_QUERY, {"id": 1}),
+    "tournament players": (TOURNAMENT_PLAYERS_QUERY, {"id": 1}),
+    "sessions by tournament": (TOURNAMENT_SESSIONS_QUERY, {"id": 1}),
+    "matches by tournament": (TOURNAMENT_MATCHES_QUERY, {"id": 1}),
+    "tournament match ids": (TOURNAMENT_MATCH_IDS_QUERY, {"id": 1}),
+    "groupe players": (GROUPES_PLAYERS_QUERY, {"ids": [1, 2]}),
+}
+
+
+def load_migrations() -> list:
+    """Migrations présentes dans migrations/, triées par version : [(version, name, sql)]."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(filename)
+        if match is None:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding="utf-8") as f:
+            migrations.append((int(match.group("version")), match.group("name"), f.read()))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Deux migrations portent le même numéro de version")
+    return migrations
+
+
+async def _driver_connection(conn):
+    # Connexion asyncpg brute : accepte plusieurs instructions SQL par appel
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+
+async def applied_versions(driver) -> set:
+    await driver.execute(CREATE_MIGRATIONS_TABLE)
+    rows = await driver.fetch("SELECT version FROM playerz.schema_migrations")
+    return {row["version"] for row in rows}
+
+
+async def migrate(engine=None) -> list:
+    """Applique les migrations en attente, chacune dans sa propre transaction."""
+    engine = engine or database.engine
+    applied = []
+    async with engine.connect() as conn:
+        driver = await _driver_connection(conn)
+        await driver.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+        try:
+            done = await applied_versions(driver)
+            for version, name, sql in load_migrations():
+                if version in done:
+                    continue
+                async with driver.transaction():
+                    await driver.execute(sql)
+                    await driver.execute(
+                        "INSERT INTO playerz.schema_migrations (version, name) VALUES ($1, $2)", version, name
+                    )
+                applied.append((version, name))
+                print(f"Migration {version:04d}_{name} applied")
+        finally:
+            await driver.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+    return applied
+
+
+async def status(engine=None) -> list:
+    """[(version, name, appliquée)] pour chaque migration connue."""
+    engine = engine or database.engine
+    async with engine.connect() as conn:
+        done = await applied_versions(await _driver_connection(conn))
+    return [(version, name, version in done) for version, name, _ in load_migrations()]
+
+
+async def check_indexes(engine=None) -> dict:
+    """Plan de chaque requête de HOT_QUERIES : {nom: (utilise un index, plan)}.
+
+    Les parcours séquentiels sont désactivés le temps de l'EXPLAIN pour que le
+    résultat ne dépende pas de la taille des tables de la base vérifiée."""
+    engine = engine or database.engine
+    report = {}
+    async with engine.connect() as conn:
+        async with conn.begin():
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for name, (query, params) in HOT_QUERIES.items():
+                result = await conn.execute(text(f"EXPLAIN {query.text}"), params)
+                plan = "\n".join(row[0] for row in result.fetchall())
+                uses_index = "Seq Scan" not in plan and "Index" in plan
+                report[name] = (uses_index, plan)
+    return report
+
+
+async def main(argv: list) -> int:
+    try:
+        return await _run(argv)
+    finally:
+        await database.engine.dispose()
+
+
+async def _run(argv: list) -> int:
+    if "--status" in argv:
+        for version, name, done in await status():
+            print(f"{version:04d}_{name}: {'applied' if done else 'pending'}")
+        return 0
+
+    if "--explain" in argv:
+        failed = 0
+        for name, (uses_index, plan) in (await check_indexes()).items():
+            print(f"{'OK  ' if uses_index else 'SEQ '} {name}")
+            if not uses_index:
+                failed += 1
+                print(plan)
+        return 1 if failed else 0
+
+    applied = await migrate()
+    if not applied:
+        print("Schema up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,60 @@
+from typing import Awaitable, Callable, Optional
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import text
+
+import database
+from cores.serialization import dumps
+
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+def keyset_clause(after_id: Optional[int], limit: Optional[int], descending: bool = False, column: str = "id"):
+    """Construit les clauses WHERE / ORDER BY / LIMIT d'une pagination par curseur (keyset).
+
+    Retourne (where, order_limit, params) à insérer dans la requête."""
+    params = {}
+    where = ""
+    if after_id is not None:
+        where = f"WHERE {column} {'<' if descending else '>'} :after_id"
+        params["after_id"] = after_id
+
+    order_limit = f"ORDER BY {column} {'DESC' if descending else 'ASC'}"
+    if limit is not None:
+        order_limit += " LIMIT :limit"
+        params["limit"] = limit
+    return where, order_limit, params
+
+
+def next_after_id(items: list, limit: Optional[int]) -> Optional[int]:
+    # Une page pleine signifie qu'il peut rester des lignes après le dernier id
+    if limit is None or len(items) < limit:
+        return None
+    return items[-1]["id"]
+
+
+def ndjson_response(
+    query: str,
+    params: dict,
+    enrich: Optional[Callable[[list, object], Awaitable[None]]] = None,
+) -> StreamingResponse:
+    """Diffuse le résultat de `query` en NDJSON via un curseur côté serveur.
+
+    La session (de lecture) est ouverte par le générateur lui-même : celle injectée
+    par `get_read_db` est déjà fermée quand la réponse commence à être envoyée.
+    `enrich` permet de compléter chaque lot de lignes (ex: joueurs d'un groupe)."""
+
+    async def generate():
+        async with await database.open_read_session() as session:
+            result = await session.stream(
+                text(query).execution_options(yield_per=STREAM_BATCH_SIZE), params
+            )
+            columns = list(result.keys())
+            async for partition in result.partitions():
+                items = [dict(zip(columns, row)) for row in partition]
+                if enrich is not None:
+                    await enrich(items, session)
+                yield b"".join(dumps(item) + b"\n" for item in items)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
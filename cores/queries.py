@@ -0,0 +1,66 @@
+from functools import lru_cache
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+SCHEMA = "playerz"
+
+# Colonnes que l'API ne doit jamais écrire
+PROTECTED_COLUMNS = frozenset({"id"})
+
+TABLE_COLUMNS_QUERY = text(
+    "SELECT column_name FROM information_schema.columns "
+    "WHERE table_schema = :schema AND table_name = :table"
+)
+
+_table_columns = {}
+
+
+class UnknownColumns(ValueError):
+    def __init__(self, table: str, columns: list):
+        super().__init__(f"UNKNOWN_COLUMNS: {', '.join(columns)} ({table})")
+        self.table = table
+        self.columns = columns
+
+
+async def table_columns(table: str, db: AsyncSession) -> frozenset:
+    """Colonnes modifiables d'une table, lues une fois dans le catalogue."""
+    columns = _table_columns.get(table)
+    if columns is None:
+        result = await db.execute(TABLE_COLUMNS_QUERY, {"schema": SCHEMA, "table": table})
+        columns = frozenset(result.scalars().all()) - PROTECTED_COLUMNS
+        # Table absente (migrations pas encore appliquées) : relire au prochain appel
+        if columns:
+            _table_columns[table] = columns
+    return columns
+
+
+async def checked_columns(table: str, data: dict, db: AsyncSession, exclude=()) -> tuple:
+    """Clés de `data` à écrire, triées ; lève UnknownColumns pour toute clé hors de la table."""
+    keys = [key for key in data if key not in exclude]
+    allowed = await table_columns(table, db)
+    unknown = sorted(key for key in keys if key not in allowed)
+    if unknown:
+        raise UnknownColumns(table, unknown)
+    return tuple(sorted(keys))
+
+
+# Une requête par combinaison de colonnes : le même texte SQL est réutilisé
+# d'une requête HTTP à l'autre, donc aussi le statement préparé par asyncpg.
+# Les colonnes passées ici doivent venir de checked_columns.
+
+@lru_cache(maxsize=256)
+def insert_query(table: str, columns: tuple, returning: str = "id"):
+    return text(
+        f"INSERT INTO {SCHEMA}.{table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(f':{column}' for column in columns)}) RETURNING {returning}"
+    )
+
+
+@lru_cache(maxsize=256)
+def update_query(table: str, columns: tuple, returning: str = None):
+    set_clause = ", ".join(f"{column} = :{column}" for column in columns)
+    query = f"UPDATE {SCHEMA}.{table} SET {set_clause} WHERE id = :id"
+    if returning:
+        query += f" RETURNING {returning}"
+    return text(query)
@@ -0,0 +1,387 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+import database
+from cores.serialization import rows_to_dicts
+
+# Statut d'un match qui ne compte pas encore dans le classement
+PENDING_STATUS = "Non commencé"
+
+# Durée de vie (en secondes) d'un classement en mémoire, 0 = illimitée. Chaque worker
+# n'applique que ses propres écritures : cette durée borne le retard sur celles des autres.
+RANKING_MAX_AGE = float(os.getenv("RANKING_MAX_AGE", "30"))
+
+# Source par défaut de GET /tournaments/{id}/ranking : le moteur en mémoire, ou la fonction
+# SQL avec plusieurs workers (SOCKETIO_REDIS_URL), chaque moteur ne voyant que ses écritures
+RANKING_SOURCE = os.getenv("RANKING_SOURCE") or ("sql" if os.getenv("SOCKETIO_REDIS_URL") else "engine")
+
+TOURNAMENT_RANKING_QUERY = text("SELECT * FROM get_tournament_ranking(:id)")
+
+# Colonnes des tableaux de statistiques, indexés par joueur
+PLAYED, WINS, DRAWS, LOSSES, POINTS_FOR, POINTS_AGAINST = range(6)
+NB_STATS = 6
+
+
+def match_contribution(match: dict) -> Optional[tuple]:
+    """Part d'un match dans le classement : (joueurs équipe 1, joueurs équipe 2, score 1, score 2)."""
+    if match.get("status") == PENDING_STATUS:
+        return None
+    score_one = match.get("score_team_one")
+    score_two = match.get("score_team_two")
+    if score_one is None or score_two is None:
+        return None
+    team_one = tuple(p for p in (match.get("t1j1"), match.get("t1j2")) if p)
+    team_two = tuple(p for p in (match.get("t2j1"), match.get("t2j2")) if p)
+    return team_one, team_two, int(score_one), int(score_two)
+
+
+class TournamentStandings:
+    """Statistiques d'un tournoi stockées dans un tableau numpy (une ligne par joueur).
+
+    Comme get_tournament_ranking(), le classement contient les joueurs inscrits et
+    ceux qui ont joué au moins un match compté."""
+
+    def __init__(self, tournament_id: int, players: dict):
+        self.tournament_id = tournament_id
+        self.pseudos = dict(players)
+        self.index = {player_id: i for i, player_id in enumerate(self.pseudos)}
+        # Les joueurs inscrits occupent les premières lignes
+        self.nb_registered = len(self.index)
+        # Faux tant qu'un joueur du classement n'a pas de pseudo connu
+        self.complete = True
+        self.player_ids = np.array(list(self.index), dtype=np.int64)
+        self.stats = np.zeros((len(self.index), NB_STATS), dtype=np.int64)
+        self.contributions = {}
+        self.loaded_at = time.monotonic()
+        self._ranking = None
+
+    def _row(self, player_id: int) -> int:
+        row = self.index.get(player_id)
+        if row is None:
+            # Joueur absent de tournament_players mais présent dans un match
+            row = len(self.index)
+            self.index[player_id] = row
+            self.player_ids = np.append(self.player_ids, player_id)
+            self.stats = np.vstack([self.stats, np.zeros((1, NB_STATS), dtype=np.int64)])
+            if player_id not in self.pseudos:
+                self.complete = False
+        return row
+
+    def missing_pseudos(self) -> list:
+        return [player_id for player_id in self.index if player_id not in self.pseudos]
+
+    def set_pseudos(self, pseudos: dict):
+        self.pseudos.update(pseudos)
+        self.complete = True
+        self._ranking = None
+
+    def _apply(self, contribution: tuple, sign: int):
+        team_one, team_two, score_one, score_two = contribution
+        for team, scored, conceded in ((team_one, score_one, score_two), (team_two, score_two, score_one)):
+            if not team:
+                continue
+            delta = np.zeros(NB_STATS, dtype=np.int64)
+            delta[PLAYED] = 1
+            delta[WINS] = scored > conceded
+            delta[DRAWS] = scored == conceded
+            delta[LOSSES] = scored < conceded
+            delta[POINTS_FOR] = scored
+            delta[POINTS_AGAINST] = conceded
+            rows = [self._row(player_id) for player_id in team]
+            # add.at : un joueur présent deux fois dans l'équipe compte deux fois, comme dans rebuild()
+            np.add.at(self.stats, rows, sign * delta)
+
+    def rebuild(self, matches: list):
+        """Recalcule toutes les statistiques en une passe vectorisée."""
+        self.contributions = {}
+        rows, scored, conceded = [], [], []
+        for match in matches:
+            contribution = match_contribution(match)
+            if contribution is None:
+                continue
+            self.contributions[match["id"]] = contribution
+            team_one, team_two, score_one, score_two = contribution
+            for team, own, other in ((team_one, score_one, score_two), (team_two, score_two, score_one)):
+                for player_id in team:
+                    rows.append(self._row(player_id))
+                    scored.append(own)
+                    conceded.append(other)
+
+        self.stats = np.zeros((len(self.index), NB_STATS), dtype=np.int64)
+        if rows:
+            rows = np.array(rows, dtype=np.int64)
+            scored = np.array(scored, dtype=np.int64)
+            conceded = np.array(conceded, dtype=np.int64)
+            np.add.at(self.stats[:, PLAYED], rows, 1)
+            np.add.at(self.stats[:, WINS], rows, scored > conceded)
+            np.add.at(self.stats[:, DRAWS], rows, scored == conceded)
+            np.add.at(self.stats[:, LOSSES], rows, scored < conceded)
+            np.add.at(self.stats[:, POINTS_FOR], rows, scored)
+            np.add.at(self.stats[:, POINTS_AGAINST], rows, conceded)
+        self._ranking = None
+
+    def set_match(self, match_id: int, match: Optional[dict]):
+        """Remplace la contribution d'un match (None = match supprimé)."""
+        previous = self.contributions.pop(match_id, None)
+        current = match_contribution(match) if match is not None else None
+        if previous == current:
+            if current is not None:
+                self.contributions[match_id] = current
+            return
+        if previous is not None:
+            self._apply(previous, -1)
+        if current is not None:
+            self._apply(current, 1)
+            self.contributions[match_id] = current
+        self._ranking = None
+
+    def rename_player(self, player_id: int, pseudo: str):
+        if player_id in self.pseudos:
+            self.pseudos[player_id] = pseudo
+            self._ranking = None
+
+    def ranking(self) -> list:
+        if self._ranking is None:
+            self._ranking = self._compute_ranking()
+        return self._ranking
+
+    def _compute_ranking(self) -> list:
+        stats = self.stats
+        diff = stats[:, POINTS_FOR] - stats[:, POINTS_AGAINST]
+        rows = np.flatnonzero((np.arange(len(stats)) < self.nb_registered) | (stats[:, PLAYED] > 0))
+        # Tri : victoires, différence de points, points marqués (décroissants), puis id joueur
+        order = rows[np.lexsort((self.player_ids[rows], -stats[rows, POINTS_FOR], -diff[rows], -stats[rows, WINS]))]
+        ranking = []
+        for rank, row in enumerate(order, start=1):
+            player_id = int(self.player_ids[row])
+            ranking.append({
+                "rank": rank,
+                "player_id": player_id,
+                "pseudo": self.pseudos.get(player_id),
+                "played": int(stats[row, PLAYED]),
+                "wins": int(stats[row, WINS]),
+                "draws": int(stats[row, DRAWS]),
+                "losses": int(stats[row, LOSSES]),
+                "points_for": int(stats[row, POINTS_FOR]),
+                "points_against": int(stats[row, POINTS_AGAINST]),
+                "point_diff": int(diff[row]),
+            })
+        return ranking
+
+
+def build_standings(tournament_id: Optional[int], players: list, sessions: list, columns: list, matches: list) -> tuple:
+    """Classements construits à partir des lignes lues, sans toucher à l'état du moteur.
+
+    Retourne (classements, tournoi de chaque session, tournoi de chaque match)."""
+    players_by_tournament = {}
+    for t_id, player_id, pseudo in players:
+        players_by_tournament.setdefault(t_id, {})[player_id] = pseudo
+
+    tournament_ids = set(players_by_tournament)
+    tournament_ids.update(t_id for _, t_id in sessions)
+    if tournament_id is not None:
+        tournament_ids.add(tournament_id)
+
+    match_tournament = {}
+    matches_by_tournament = {t_id: [] for t_id in tournament_ids}
+    for row in matches:
+        match = dict(zip(columns, row[1:]))
+        match_tournament[match["id"]] = row[0]
+        matches_by_tournament[row[0]].append(match)
+    session_tournament = {session_id: t_id for session_id, t_id in sessions}
+
+    tournaments = {}
+    for t_id in tournament_ids:
+        standings = TournamentStandings(t_id, players_by_tournament.get(t_id, {}))
+        standings.rebuild(matches_by_tournament[t_id])
+        tournaments[t_id] = standings
+    return tournaments, session_tournament, match_tournament
+
+
+class RankingEngine:
+    """Classements des tournois gardés en mémoire et mis à jour par deltas à chaque score."""
+
+    def __init__(self):
+        self.tournaments = {}
+        self.session_tournament = {}
+        self.match_tournament = {}
+        # Matches écrits pendant un chargement, rejoués une fois les classements installés
+        self._loads = 0
+        self._changes = []
+
+    def _is_fresh(self, standings: TournamentStandings) -> bool:
+        if not standings.complete:
+            return False
+        return RANKING_MAX_AGE <= 0 or time.monotonic() - standings.loaded_at < RANKING_MAX_AGE
+
+    async def get_ranking(self, tournament_id: int) -> list:
+        standings = self.tournaments.get(tournament_id)
+        if standings is None or not self._is_fresh(standings):
+            # Chargé depuis le primaire : un état lu sur un réplica en retard
+            # resterait faux, les deltas suivants s'appliquant par-dessus
+            async with database.AsyncSessionLocal() as session:
+                standings = await self.load(tournament_id, session)
+        return standings.ranking()
+
+    async def load(self, tournament_id: int, db: AsyncSession) -> TournamentStandings:
+        """Reconstruit le classement d'un tournoi depuis la base."""
+        await self.load_all(db, tournament_id)
+        return self.tournaments[tournament_id]
+
+    async def load_all(self, db: AsyncSession, tournament_id: Optional[int] = None):
+        """Reconstruit tous les classements (ou celui d'un seul tournoi) depuis la base.
+
+        Un score écrit pendant les lectures peut manquer à l'instantané lu : les
+        matches appliqués entre-temps sont rejoués sur les classements installés."""
+        self._loads += 1
+        first_change = len(self._changes)
+        try:
+            await self._load(db, tournament_id)
+            for operation, value in self._changes[first_change:]:
+                if operation == "apply":
+                    self._apply_match(value)
+                else:
+                    self._remove_match(value)
+        finally:
+            self._loads -= 1
+            if not self._loads:
+                self._changes = []
+
+    async def _load(self, db: AsyncSession, tournament_id: Optional[int]):
+        where = "WHERE tp.tournament_id = :id" if tournament_id is not None else ""
+        players_result = await db.execute(
+            text(f"""
+                SELECT tp.tournament_id, p.id, p.pseudo
+                FROM playerz.tournament_players tp
+                JOIN playerz.players p ON p.id = tp.player_id
+                {where}
+                ORDER BY tp.tournament_id, p.id
+            """),
+            {"id": tournament_id},
+        )
+        players = players_result.fetchall()
+
+        where = "WHERE s.tournament_id = :id" if tournament_id is not None else ""
+        sessions_result = await db.execute(
+            text(f"SELECT s.id, s.tournament_id FROM playerz.sessions s {where}"),
+            {"id": tournament_id},
+        )
+        sessions = sessions_result.fetchall()
+
+        matches_result = await db.execute(
+            text(f"""
+                SELECT s.tournament_id, m.id, m.session_id, m.status,
+                    m.t1j1, m.t1j2, m.t2j1, m.t2j2, m.score_team_one, m.score_team_two
+                FROM playerz.matches m
+                JOIN playerz.sessions s ON s.id = m.session_id
+                {where}
+            """),
+            {"id": tournament_id},
+        )
+        columns = list(matches_result.keys())[1:]
+        matches = matches_result.fetchall()
+
+        # Calcul dans un thread : un chargement complet ne bloque pas la boucle
+        # d'événements (/healthz, autres requêtes) ; l'état est installé ensuite sur la boucle
+        tournaments, session_tournament, match_tournament = await asyncio.to_thread(
+            build_standings, tournament_id, players, sessions, columns, matches
+        )
+
+        # Pseudos des joueurs non inscrits qui ont joué un match
+        missing = {player_id for standings in tournaments.values() for player_id in standings.missing_pseudos()}
+        if missing:
+            result = await db.execute(
+                text("SELECT id, pseudo FROM playerz.players WHERE id = ANY(:ids)"), {"ids": list(missing)}
+            )
+            pseudos = dict(result.all())
+            for standings in tournaments.values():
+                standings.set_pseudos({player_id: pseudos.get(player_id) for player_id in standings.missing_pseudos()})
+        if tournament_id is None:
+            self.tournaments = tournaments
+            self.session_tournament = session_tournament
+            self.match_tournament = match_tournament
+        else:
+            self.drop(tournament_id)
+            self.tournaments.update(tournaments)
+            self.session_tournament.update(session_tournament)
+            self.match_tournament.update(match_tournament)
+
+    def apply_match(self, match: dict):
+        """Applique le nouvel état d'un match (après création / mise à jour du score)."""
+        if self._loads:
+            self._changes.append(("apply", match))
+        self._apply_match(match)
+
+    def _apply_match(self, match: dict):
+        match_id = match["id"]
+        previous_tournament = self.match_tournament.get(match_id)
+        tournament_id = self.session_tournament.get(match.get("session_id"))
+
+        if previous_tournament is not None and previous_tournament != tournament_id:
+            self.remove_match(match_id)
+        standings = self.tournaments.get(tournament_id)
+        if standings is None:
+            # Tournoi pas encore chargé : il sera construit à la première lecture
+            return
+        self.match_tournament[match_id] = tournament_id
+        standings.set_match(match_id, match)
+
+    def remove_match(self, match_id: int):
+        if self._loads:
+            self._changes.append(("remove", match_id))
+        self._remove_match(match_id)
+
+    def _remove_match(self, match_id: int):
+        tournament_id = self.match_tournament.pop(match_id, None)
+        standings = self.tournaments.get(tournament_id)
+        if standings is not None:
+            standings.set_match(match_id, None)
+
+    def rename_player(self, player_id: int, pseudo: str):
+        for standings in self.tournaments.values():
+            standings.rename_player(player_id, pseudo)
+
+    def drop(self, tournament_id: int):
+        if self.tournaments.pop(tournament_id, None) is None:
+            return
+        self.match_tournament = {
+            match_id: t_id for match_id, t_id in self.match_tournament.items() if t_id != tournament_id
+        }
+        self.session_tournament = {
+            session_id: t_id for session_id, t_id in self.session_tournament.items() if t_id != tournament_id
+        }
+
+
+ranking_engine = RankingEngine()
+
+
+async def read_ranking(tournament_id: int, db: AsyncSession, source: str = RANKING_SOURCE) -> list:
+    """Classement d'un tournoi, lu dans le moteur en mémoire ou calculé par get_tournament_ranking()."""
+    if source == "engine":
+        return await ranking_engine.get_ranking(tournament_id)
+    result = await db.execute(TOURNAMENT_RANKING_QUERY, {"id": tournament_id})
+    return rows_to_dicts(result, result.fetchall())
+
+
+async def get_sessions_tournament_ids(session_ids, db: AsyncSession) -> dict:
+    """Tournoi de chaque session : {session_id: tournament_id}, une requête au plus pour les inconnues."""
+    tournament_ids = {}
+    missing = []
+    for session_id in set(session_ids) - {None}:
+        tournament_id = ranking_engine.session_tournament.get(session_id)
+        if tournament_id is None:
+            missing.append(session_id)
+        else:
+            tournament_ids[session_id] = tournament_id
+    if missing:
+        result = await db.execute(
+            text("SELECT id, tournament_id FROM playerz.sessions WHERE id = ANY(:ids)"), {"ids": missing}
+        )
+        tournament_ids.update(result.all())
+    return tournament_ids
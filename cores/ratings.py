@@ -0,0 +1,277 @@
+import asyncio
+import os
+from typing import Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+import database
+from cores.ranking import PENDING_STATUS, match_contribution
+
+INITIAL_RATING = float(os.getenv("RATING_INITIAL", "1000"))
+RATING_K = float(os.getenv("RATING_K", "32"))
+
+MATCH_HISTORY_QUERY = text(
+    """
+    SELECT id, t1j1, t1j2, t2j1, t2j2, score_team_one, score_team_two
+    FROM playerz.matches
+    WHERE status IS DISTINCT FROM :pending
+        AND score_team_one IS NOT NULL
+        AND score_team_two IS NOT NULL
+    ORDER BY id
+    """
+)
+
+
+def expected_score(rating: np.ndarray, opponent: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + 10.0 ** ((opponent - rating) / 400.0))
+
+
+def match_batches(slots: np.ndarray) -> np.ndarray:
+    """Numéro de lot de chaque match : un match passe après tous les matches
+    précédents de ses joueurs, les matches d'un même lot n'ont aucun joueur en
+    commun et peuvent être calculés ensemble sans changer le résultat d'un Elo
+    séquentiel."""
+    last_batch = np.full(slots.max() + 2 if slots.size else 1, -1, dtype=np.int64)
+    batches = np.empty(len(slots), dtype=np.int64)
+    for i, row in enumerate(slots.tolist()):
+        players = [p for p in row if p >= 0]
+        batch = max(last_batch[p] for p in players) + 1 if players else 0
+        batches[i] = batch
+        for p in players:
+            last_batch[p] = batch
+    return batches
+
+
+class MatchDeltas:
+    """Variation appliquée par chaque match : places de ses joueurs (n, 4) et variation (n,) en tableaux numpy.
+
+    Les matches du recalcul complet sont retrouvés par recherche dichotomique
+    dans leurs ids triés ; ceux appliqués ensuite sont ajoutés en fin de
+    tableau (capacité doublée au besoin) et indexés par id. Un match retiré
+    garde sa ligne, vidée (places à -1, variation nulle)."""
+
+    def __init__(self, match_ids: Optional[np.ndarray] = None, slots: Optional[np.ndarray] = None,
+                 deltas: Optional[np.ndarray] = None):
+        self.match_ids = match_ids if match_ids is not None else np.empty(0, dtype=np.int64)
+        self.slots = slots if slots is not None else np.empty((0, 4), dtype=np.int32)
+        self.deltas = deltas if deltas is not None else np.empty(0, dtype=float)
+        self.size = len(self.match_ids)
+        self.added = {}
+
+    def _row(self, match_id: int) -> Optional[int]:
+        row = self.added.get(match_id)
+        if row is None:
+            row = int(np.searchsorted(self.match_ids, match_id))
+            if row == len(self.match_ids) or self.match_ids[row] != match_id:
+                return None
+        return row
+
+    def __contains__(self, match_id: int) -> bool:
+        row = self._row(match_id)
+        return row is not None and bool((self.slots[row] >= 0).any())
+
+    def pop(self, match_id: int) -> Optional[tuple]:
+        """(places, variation) du match, retiré ; None s'il n'a pas de variation."""
+        row = self._row(match_id)
+        if row is None or not (self.slots[row] >= 0).any():
+            return None
+        previous = self.slots[row].tolist(), float(self.deltas[row])
+        self.slots[row] = -1
+        self.deltas[row] = 0.0
+        return previous
+
+    def set(self, match_id: int, row_slots: list, delta: float):
+        row = self._row(match_id)
+        if row is None:
+            if self.size == len(self.deltas):
+                capacity = max(2 * self.size, 16)
+                self.slots = np.concatenate([self.slots, np.full((capacity - self.size, 4), -1, dtype=np.int32)])
+                self.deltas = np.concatenate([self.deltas, np.zeros(capacity - self.size, dtype=float)])
+            row = self.size
+            self.size += 1
+            self.added[match_id] = row
+        self.slots[row] = row_slots
+        self.deltas[row] = delta
+
+
+def compute_ratings(rows: list) -> tuple:
+    """Recalcul complet ; `rows` = (id, t1j1, t1j2, t2j1, t2j2, score 1, score 2) triés par id.
+
+    Retourne (index des joueurs, classements, variation de chaque match) sans
+    toucher à l'état du moteur : exécutable dans un thread."""
+    if not rows:
+        return {}, np.empty(0, dtype=float), MatchDeltas()
+
+    data = np.array([[value or 0 for value in row] for row in rows], dtype=np.int64)
+    match_ids, players, scores = data[:, 0], data[:, 1:5], data[:, 5:7]
+
+    # Joueurs -> indices compacts, -1 pour une place vide
+    player_ids, inverse = np.unique(players, return_inverse=True)
+    slots = inverse.reshape(players.shape)
+    empty = np.searchsorted(player_ids, 0)
+    has_empty = empty < len(player_ids) and player_ids[empty] == 0
+    if has_empty:
+        slots = np.where(players == 0, -1, slots - (slots > empty))
+        player_ids = np.delete(player_ids, empty)
+    index = {int(player_id): i for i, player_id in enumerate(player_ids)}
+    ratings = np.full(len(player_ids), INITIAL_RATING, dtype=float)
+
+    outcome = np.where(scores[:, 0] > scores[:, 1], 1.0, np.where(scores[:, 0] < scores[:, 1], 0.0, 0.5))
+    deltas = np.zeros(len(data), dtype=float)
+    batches = match_batches(slots)
+    order = np.argsort(batches, kind="stable")
+    bounds = np.flatnonzero(np.diff(batches[order])) + 1
+    padded = np.append(ratings, np.nan)
+
+    for batch in np.split(order, bounds):
+        batch_slots = slots[batch]
+        values = padded[batch_slots]
+        team_one = np.nanmean(values[:, :2], axis=1)
+        team_two = np.nanmean(values[:, 2:], axis=1)
+        valid = ~(np.isnan(team_one) | np.isnan(team_two))
+        delta = np.where(valid, RATING_K * (outcome[batch] - expected_score(team_one, team_two)), 0.0)
+        deltas[batch] = delta
+        signed = np.stack([delta, delta, -delta, -delta], axis=1)
+        mask = batch_slots >= 0
+        np.add.at(padded, batch_slots[mask], signed[mask])
+
+    # Copie : une vue garderait en mémoire tout le tableau `data`
+    return index, padded[:-1], MatchDeltas(match_ids.copy(), slots.astype(np.int32), deltas)
+
+
+class RatingEngine:
+    """Classement Elo des joueurs en double, calculé sur tout l'historique des matches.
+
+    La force d'une équipe est la moyenne de ses joueurs ; chaque joueur gagne ou
+    perd K * (résultat - résultat attendu). Un recalcul complet traite
+    l'historique par lots vectorisés ; un score modifié annule la variation
+    précédente du match et applique la nouvelle avec les classements actuels."""
+
+    def __init__(self):
+        self.loaded = False
+        self.index = {}
+        self.ratings = np.empty(0, dtype=float)
+        self.match_deltas = MatchDeltas()
+        # Chargement en cours, partagé par les appels simultanés à ensure_loaded
+        self._loading = None
+        # Matches écrits pendant un recalcul, rejoués une fois les classements installés
+        self._loads = 0
+        self._changes = []
+
+    def _slot(self, player_id: int) -> int:
+        slot = self.index.get(player_id)
+        if slot is None:
+            slot = len(self.index)
+            self.index[player_id] = slot
+            self.ratings = np.append(self.ratings, INITIAL_RATING)
+        return slot
+
+    def get(self, player_id: int) -> float:
+        slot = self.index.get(player_id)
+        return float(self.ratings[slot]) if slot is not None else INITIAL_RATING
+
+    async def ensure_loaded(self):
+        """Charge les classements au premier besoin ; les appels simultanés attendent le même chargement."""
+        if self.loaded:
+            return
+        if self._loading is None or self._loading.done():
+            self._loading = asyncio.get_running_loop().create_task(self._load())
+        # shield : une requête annulée n'interrompt pas le chargement attendu par les autres
+        await asyncio.shield(self._loading)
+
+    async def _load(self):
+        # Historique lu sur le primaire, comme pour les classements (cf. RankingEngine.get_ranking)
+        async with database.AsyncSessionLocal() as session:
+            await self.recompute(session)
+
+    async def recompute(self, db: AsyncSession):
+        """Recalcul complet depuis la base, le calcul dans un thread pour ne pas bloquer la boucle.
+
+        Les matches écrits pendant ce temps sont rejoués sur les classements installés."""
+        self._loads += 1
+        first_change = len(self._changes)
+        try:
+            result = await db.execute(MATCH_HISTORY_QUERY, {"pending": PENDING_STATUS})
+            rows = result.fetchall()
+            self._install(*await asyncio.to_thread(compute_ratings, rows))
+            for operation, value in self._changes[first_change:]:
+                if operation == "apply":
+                    self._apply_match(value)
+                else:
+                    self._revert(value)
+        finally:
+            self._loads -= 1
+            if not self._loads:
+                self._changes = []
+
+    def recompute_from_rows(self, rows: list):
+        """Recalcul complet ; `rows` = (id, t1j1, t1j2, t2j1, t2j2, score 1, score 2) triés par id."""
+        self._install(*compute_ratings(rows))
+
+    def _install(self, index: dict, ratings: np.ndarray, match_deltas: MatchDeltas):
+        self.index = index
+        self.ratings = ratings
+        self.match_deltas = match_deltas
+        self.loaded = True
+
+    def _revert(self, match_id: int):
+        previous = self.match_deltas.pop(match_id)
+        if previous is None:
+            return
+        row_slots, delta = previous
+        for position, slot in enumerate(row_slots):
+            if slot >= 0:
+                self.ratings[slot] -= delta if position < 2 else -delta
+
+    def apply_match(self, match: dict):
+        """Met à jour les classements après création / modification d'un match."""
+        if self._loads:
+            self._changes.append(("apply", match))
+        self._apply_match(match)
+
+    def _apply_match(self, match: dict):
+        if not self.loaded:
+            return
+        self._revert(match["id"])
+        contribution = match_contribution(match)
+        if contribution is None:
+            return
+        team_one, team_two, score_one, score_two = contribution
+        if not team_one or not team_two:
+            return
+
+        row_slots = [-1, -1, -1, -1]
+        for position, player_id in enumerate(team_one[:2]):
+            row_slots[position] = self._slot(player_id)
+        for position, player_id in enumerate(team_two[:2]):
+            row_slots[2 + position] = self._slot(player_id)
+
+        rating_one = np.mean([self.ratings[s] for s in row_slots[:2] if s >= 0])
+        rating_two = np.mean([self.ratings[s] for s in row_slots[2:] if s >= 0])
+        outcome = 1.0 if score_one > score_two else 0.0 if score_one < score_two else 0.5
+        delta = float(RATING_K * (outcome - expected_score(rating_one, rating_two)))
+        for position, slot in enumerate(row_slots):
+            if slot >= 0:
+                self.ratings[slot] += delta if position < 2 else -delta
+        self.match_deltas.set(match["id"], row_slots, delta)
+
+    def remove_match(self, match_id: int):
+        if self._loads:
+            self._changes.append(("remove", match_id))
+        if self.loaded:
+            self._revert(match_id)
+
+    def leaderboard(self, limit: Optional[int] = None) -> list:
+        player_ids = np.array(list(self.index), dtype=np.int64)
+        order = np.argsort(-self.ratings, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return [
+            {"rank": rank, "player_id": int(player_ids[i]), "rating": round(float(self.ratings[i]), 2)}
+            for rank, i in enumerate(order, start=1)
+        ]
+
+
+rating_engine = RatingEngine()
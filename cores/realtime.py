@@ -0,0 +1,117 @@
+import asyncio
+import os
+
+import socketio
+from fastapi.encoders import jsonable_encoder
+
+import database
+from cores.ranking import RANKING_SOURCE, ranking_engine, read_ranking
+
+# Avec plusieurs workers, les événements passent par Redis pour atteindre
+# les clients connectés aux autres processus
+SOCKETIO_REDIS_URL = os.getenv("SOCKETIO_REDIS_URL")
+# Délai avant de diffuser le classement d'un tournoi : les scores écrits entre-temps
+# sur ce tournoi partent dans la même diffusion
+RANKING_PUSH_DELAY = float(os.getenv("RANKING_PUSH_DELAY", "0.5"))
+
+client_manager = socketio.AsyncRedisManager(SOCKETIO_REDIS_URL) if SOCKETIO_REDIS_URL else None
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    cors_allowed_origins="*",
+    client_manager=client_manager,
+)
+# Monté par main.py sur /ws : les clients se connectent avec le path "/ws/socket.io"
+socket_app = socketio.ASGIApp(sio, socketio_path="/ws/socket.io")
+
+
+def tournament_room(tournament_id: int) -> str:
+    return f"tournament:{tournament_id}"
+
+
+def _tournament_id(data) -> int:
+    if isinstance(data, dict):
+        data = data.get("tournament_id")
+    return int(data)
+
+
+@sio.event
+async def subscribe(sid, data):
+    try:
+        tournament_id = _tournament_id(data)
+    except (TypeError, ValueError):
+        return {"message": "INVALID_TOURNAMENT_ID"}
+    await sio.enter_room(sid, tournament_room(tournament_id))
+    return {"message": "SUBSCRIBED", "tournament_id": tournament_id}
+
+
+@sio.event
+async def unsubscribe(sid, data):
+    try:
+        tournament_id = _tournament_id(data)
+    except (TypeError, ValueError):
+        return {"message": "INVALID_TOURNAMENT_ID"}
+    await sio.leave_room(sid, tournament_room(tournament_id))
+    return {"message": "UNSUBSCRIBED", "tournament_id": tournament_id}
+
+
+# Diffusion de classement programmée et pas encore commencée, par tournoi
+_pending_rankings = {}
+_ranking_tasks = set()
+
+
+async def publish_match_updates(matches_by_tournament: dict):
+    """Diffuse les matches modifiés aux abonnés, puis programme la diffusion du classement de leur tournoi.
+
+    Un seul emit par salle : le paquet est encodé une fois quel que soit le nombre de spectateurs.
+    Le classement est diffusé en tâche de fond : l'écriture n'attend ni sa lecture ni son
+    rechargement."""
+    for tournament_id, matches in matches_by_tournament.items():
+        if tournament_id is not None:
+            await _publish_matches(tournament_id, matches)
+            schedule_ranking_push(tournament_id)
+
+
+async def _publish_matches(tournament_id: int, matches: list):
+    try:
+        room = tournament_room(tournament_id)
+        for match in matches:
+            await sio.emit("match_updated", {"tournament_id": tournament_id, "match": jsonable_encoder(match)}, room=room)
+    except Exception as e:
+        # La diffusion ne doit jamais faire échouer l'écriture déjà validée
+        print("Realtime publish failed : ", e)
+
+
+def schedule_ranking_push(tournament_id: int):
+    if tournament_id in _pending_rankings:
+        return
+    task = asyncio.get_running_loop().create_task(_push_ranking(tournament_id))
+    _pending_rankings[tournament_id] = task
+    _ranking_tasks.add(task)
+    task.add_done_callback(_ranking_tasks.discard)
+
+
+async def _push_ranking(tournament_id: int):
+    """Diffuse le classement que renvoie GET /tournaments/{id}/ranking (même source, cf. RANKING_SOURCE).
+
+    Il est lu sur le primaire, pour inclure l'écriture qui vient d'être validée. Avec
+    plusieurs workers (Redis) et la source engine, le classement en mémoire ne contient
+    pas les écritures des autres workers : il est d'abord rechargé."""
+    await asyncio.sleep(RANKING_PUSH_DELAY)
+    # Les écritures suivantes programment une nouvelle diffusion
+    _pending_rankings.pop(tournament_id, None)
+    try:
+        async with database.AsyncSessionLocal() as session:
+            if client_manager is not None and RANKING_SOURCE == "engine":
+                await ranking_engine.load(tournament_id, session)
+            ranking = await read_ranking(tournament_id, session)
+        await sio.emit(
+            "ranking_updated", {"tournament_id": tournament_id, "ranking": ranking}, room=tournament_room(tournament_id)
+        )
+    except Exception as e:
+        print("Realtime ranking push failed : ", e)
+
+
+async def stop_ranking_pushes():
+    for task in list(_ranking_tasks):
+        task.cancel()
+    await asyncio.gather(*_ranking_tasks, return_exceptions=True)
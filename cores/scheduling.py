@@ -0,0 +1,79 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+# Valeur utilisée pour l'équipe fictive (exempt) quand le nombre d'équipes est impair
+BYE = -1
+
+
+def round_robin(nb_teams: int) -> np.ndarray:
+    """Calendrier aller simple par la méthode du cercle.
+
+    Retourne un tableau (tours, matches par tour, 2) d'indices d'équipes ; chaque
+    équipe rencontre toutes les autres une fois et joue au plus une fois par tour.
+    Les matches contre l'exempt sont retirés, d'où un tableau de tours de taille
+    fixe n // 2."""
+    if nb_teams < 2:
+        return np.empty((0, 0, 2), dtype=np.int64)
+
+    size = nb_teams + (nb_teams % 2)
+    rounds = np.arange(size - 1)[:, None]
+    # Position 0 fixe, les autres tournent d'un cran à chaque tour
+    rotation = (np.arange(size - 1)[None, :] - rounds) % (size - 1) + 1
+    positions = np.hstack([np.zeros((size - 1, 1), dtype=np.int64), rotation])
+    positions[positions == nb_teams] = BYE
+
+    half = size // 2
+    home = positions[:, :half]
+    away = positions[:, ::-1][:, :half]
+    # Alterner domicile / extérieur de l'équipe fixe pour équilibrer
+    swap = (np.arange(size - 1) % 2 == 1)
+    home[:, 0], away[:, 0] = np.where(swap, away[:, 0], home[:, 0]), np.where(swap, home[:, 0], away[:, 0])
+    pairs = np.stack([home, away], axis=2)
+
+    if size != nb_teams:
+        keep = (pairs != BYE).all(axis=2)
+        pairs = pairs[keep].reshape(size - 1, half - 1, 2)
+    return pairs
+
+
+def swiss_pairing(scores: np.ndarray, played: Optional[Iterable[tuple]] = None) -> np.ndarray:
+    """Appariement d'une ronde suisse.
+
+    Les équipes sont triées par score décroissant (ordre d'origine en cas
+    d'égalité) et chacune rencontre la suivante qu'elle n'a pas encore affrontée.
+    Retourne un tableau (matches, 2) d'indices ; l'équipe restante en cas de
+    nombre impair est exemptée."""
+    played = {frozenset(pair) for pair in (played or [])}
+    order = np.argsort(-np.asarray(scores, dtype=float), kind="stable")
+    available = list(order)
+    pairs = []
+    while len(available) > 1:
+        team = available.pop(0)
+        opponent_pos = next(
+            (i for i, other in enumerate(available) if frozenset((team, other)) not in played), 0
+        )
+        pairs.append((team, available.pop(opponent_pos)))
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def split_into_sessions(rounds: np.ndarray, matches_per_session: int, max_sessions: Optional[int] = None) -> list:
+    """Découpe chaque tour en sessions équilibrées d'au plus `matches_per_session` matches.
+
+    Une session ne contient jamais deux matches de la même équipe puisqu'elle
+    est extraite d'un seul tour."""
+    sessions = []
+    if rounds.size == 0:
+        return sessions
+    # Tous les tours ont la même taille : bornes des sessions calculées une fois
+    nb_pairs = rounds.shape[1]
+    nb_chunks = -(-nb_pairs // matches_per_session)
+    sizes = np.full(nb_chunks, nb_pairs // nb_chunks)
+    sizes[:nb_pairs % nb_chunks] += 1
+    bounds = list(zip(np.cumsum(sizes) - sizes, np.cumsum(sizes)))
+    for round_pairs in rounds:
+        for start, stop in bounds:
+            if max_sessions is not None and len(sessions) >= max_sessions:
+                return sessions
+            sessions.append(round_pairs[start:stop])
+    return sessions
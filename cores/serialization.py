@@ -0,0 +1,71 @@
+import functools
+import inspect
+from decimal import Decimal
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def rows_to_dicts(result, rows) -> list:
+    """Convertit des lignes SQLAlchemy en dict (colonnes lues une seule fois)."""
+    columns = tuple(result.keys())
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def row_to_dict(result, row) -> dict:
+    return dict(zip(tuple(result.keys()), row))
+
+
+def _default(obj):
+    # Types qu'orjson ne connaît pas : même rendu que jsonable_encoder
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return jsonable_encoder(obj)
+
+
+def dumps(content) -> bytes:
+    """Encode en JSON ; datetime, date, UUID et numpy sont gérés nativement par orjson."""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _direct_response(endpoint):
+    """Renvoie directement une FastJSONResponse : FastAPI ne repasse pas le
+    résultat dans jsonable_encoder, qui coûte bien plus que l'encodage lui-même."""
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        value = await endpoint(*args, **kwargs)
+        if isinstance(value, Response):
+            return value
+        return FastJSONResponse(value)
+
+    return wrapper
+
+
+class FastJSONRoute(APIRoute):
+    """Route dont les réponses dict / list sont encodées par orjson.
+
+    A utiliser comme route_class des routers (cf. main.py pour l'application)."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        response_model = kwargs.get("response_model")
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = response_model.value
+        # Une route avec response_model garde la validation / sérialisation de FastAPI
+        if inspect.iscoroutinefunction(endpoint) and response_model is None:
+            endpoint = _direct_response(endpoint)
+        if isinstance(kwargs.get("response_class"), DefaultPlaceholder):
+            kwargs["response_class"] = FastJSONResponse
+        super().__init__(path, endpoint, **kwargs)
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, UTC
+
+from sqlalchemy import event
+
+from cores.metrics import current_request
+from cores.serialization import dumps
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Part des requêtes lentes dont le plan est capturé, et délai avant de recapturer le plan d'une même requête
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+SLOW_QUERY_MAX_PENDING_EXPLAINS = 2
+SLOW_QUERY_HISTORY = int(os.getenv("SLOW_QUERY_HISTORY", "100"))
+
+EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+recent_slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+_last_explained = {}
+_pending = set()
+# Moteur async de chaque moteur surveillé, pour ouvrir la connexion de l'EXPLAIN
+_engines = {}
+
+
+def parameters_shape(parameters) -> list:
+    """Types (et tailles des listes) des paramètres, sans leurs valeurs."""
+    if isinstance(parameters, dict):
+        parameters = parameters.values()
+    shape = []
+    for value in parameters or ():
+        if isinstance(value, (list, tuple)):
+            shape.append(f"{type(value).__name__}[{len(value)}]")
+        else:
+            shape.append(type(value).__name__)
+    return shape
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["slow_query_started"].pop()) * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+
+    stats = current_request.get()
+    entry = {
+        "at": datetime.now(UTC),
+        "duration_ms": round(elapsed_ms, 1),
+        "route": f"{stats.scope['method']} {stats.route}" if stats is not None else None,
+        "statement": " ".join(statement.split()),
+        "parameters": parameters_shape(parameters),
+        "executemany": executemany,
+        "plan": None,
+    }
+    recent_slow_queries.append(entry)
+    if not executemany and _should_explain(entry["statement"]):
+        _schedule_explain(_engines[conn.engine], entry, statement, parameters)
+    else:
+        print("Slow query : ", dumps(entry).decode())
+
+
+def _should_explain(statement: str) -> bool:
+    if not statement.lower().startswith(EXPLAINABLE):
+        return False
+    if len(_pending) >= SLOW_QUERY_MAX_PENDING_EXPLAINS or random.random() >= SLOW_QUERY_EXPLAIN_SAMPLE:
+        return False
+    now = time.monotonic()
+    if now - _last_explained.get(statement, float("-inf")) < SLOW_QUERY_EXPLAIN_INTERVAL:
+        return False
+    _last_explained[statement] = now
+    if len(_last_explained) > 4 * SLOW_QUERY_HISTORY:
+        _last_explained.clear()
+    return True
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("slow_query_started") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def _schedule_explain(engine, entry: dict, statement: str, parameters):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        print("Slow query : ", dumps(entry).decode())
+        return
+    task = loop.create_task(_explain(engine, entry, statement, parameters))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def _explain(engine, entry: dict, statement: str, parameters):
+    """Capture le plan (sans ANALYZE : la requête n'est pas réexécutée) puis écrit l'entrée du log."""
+    try:
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            # Connexion asyncpg brute : même texte SQL ($1, $2...) et mêmes paramètres que la
+            # requête lente, sans passer par les hooks (l'EXPLAIN n'est ni compté ni journalisé)
+            rows = await raw.driver_connection.fetch(f"EXPLAIN {statement}", *(parameters or ()))
+            entry["plan"] = "\n".join(row[0] for row in rows)
+    except Exception as e:
+        entry["plan"] = f"EXPLAIN failed : {e}"
+    print("Slow query : ", dumps(entry).decode())
+
+
+def watch_engine(engine):
+    """Journalise les requêtes d'un moteur (AsyncEngine) plus lentes que SLOW_QUERY_MS."""
+    sync_engine = engine.sync_engine
+    if SLOW_QUERY_MS > 0 and not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        _engines[sync_engine] = engine
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
@@ -1,31 +1,115 @@
+import hashlib
 import os
+import uuid
 from fastapi import UploadFile
-from datetime import datetime
+from starlette.datastructures import Headers
 import aiofiles
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+import cores.config  # noqa: F401  (.env chargé avant la lecture de UPLOAD_MAX_BYTES)
+from cores.serialization import FastJSONResponse
+
+# Taille maximale d'un upload (octets) et taille des blocs lus
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Marge pour l'enveloppe multipart (séparateurs, en-têtes des parties) autour du fichier
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """Refuse (413) le corps trop gros d'une requête d'upload avant que Starlette ne l'écrive sur disque.
+
+    Content-Length est vérifié avant toute lecture ; sans lui (envoi chunked),
+    les octets sont comptés à la réception et la lecture s'arrête dès la limite
+    dépassée."""
+
+    def __init__(self, app, paths: tuple, max_bytes: int = UPLOAD_MAX_BYTES + UPLOAD_MULTIPART_OVERHEAD):
+        self.app = app
+        self.paths = paths
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            content_length = int(Headers(scope=scope).get("content-length", "0"))
+        except ValueError:
+            content_length = 0
+        if content_length > self.max_bytes:
+            await self.reject(scope, receive, send)
+            return
+
+        received = 0
+        too_large = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            if too_large:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Le parseur multipart s'arrête comme sur une déconnexion du client
+                    too_large = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            # La réponse d'erreur de l'application (corps illisible) est remplacée par le 413
+            if not too_large:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+        if too_large:
+            await self.reject(scope, receive, send)
+
+    async def reject(self, scope, receive, send):
+        response = FastJSONResponse(
+            status_code=413,
+            content={"detail": f"Fichier trop volumineux: fichier supérieur à {UPLOAD_MAX_BYTES} octets"},
+        )
+        await response(scope, receive, send)
+
 
 async def upload_file_to_storage(file: UploadFile, dirr: str) -> str:
     # Utiliser le chemin configuré pour les uploads
     upload_dir = dirr
     os.makedirs(upload_dir, exist_ok=True)
 
-    # Générer un nom de fichier unique
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_extension = os.path.splitext(file.filename)[1]
-    new_filename = f"{timestamp}{file_extension}"
-    file_path = os.path.join(upload_dir, new_filename)
-    print(file_path)
+    # Ecrire par blocs dans un fichier temporaire en calculant le hash au passage
+    file_extension = os.path.splitext(file.filename or "")[1].lower()
+    tmp_path = os.path.join(upload_dir, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as out_file:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise UploadTooLarge(f"fichier supérieur à {UPLOAD_MAX_BYTES} octets")
+                digest.update(chunk)
+                await out_file.write(chunk)
 
-    # Sauvegarder le fichier
-    async with aiofiles.open(file_path, 'wb') as out_file:
-        content = await file.read()
-        await out_file.write(content)
+        # Nom de fichier = hash du contenu : un fichier identique réutilise l'existant
+        new_filename = f"{digest.hexdigest()}{file_extension}"
+        file_path = os.path.join(upload_dir, new_filename)
+        if os.path.exists(file_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
     # Get URL_SERVER from environment variables
     url_server = os.getenv("URL_SERVER")
 
     # Retourner l'URL du fichier
-    return f"{url_server}/file/{new_filename}"
\ No newline at end of file
+    return f"{url_server}/file/{new_filename}"
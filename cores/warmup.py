@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+
+import database
+from cores.config import PROCESS_STARTED
+from cores.queries import table_columns
+from cores.ratings import rating_engine
+from cores.serialization import dumps
+from routes.games import GROUP_MEMBERS_CHECK_QUERY
+from routes.groupes import GROUPE_BY_ID_QUERY
+from routes.matches import MATCH_BY_ID_QUERY
+from routes.players import PLAYER_BY_ID_QUERY
+from routes.tournaments import TOURNAMENT_BY_ID_QUERY, TOURNAMENT_SNAPSHOT_QUERY
+
+# Connexions ouvertes dès le démarrage dans chaque pool (primaire et réplicas)
+DB_POOL_WARM = min(int(os.getenv("DB_POOL_WARM", "2")), database.DB_POOL_SIZE)
+# Délai entre deux tentatives tant que le primaire est injoignable
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+# Requêtes préparées sur chaque connexion chauffée. Le cache de statements est propre
+# à la connexion et indexé par le texte SQL : on exécute les constantes des routes
+# elles-mêmes, avec des paramètres qui ne correspondent à aucune ligne.
+WARM_STATEMENTS = [
+    (PLAYER_BY_ID_QUERY, {"id": 0}),
+    (GROUPE_BY_ID_QUERY, {"id": 0}),
+    (MATCH_BY_ID_QUERY, {"id": 0}),
+    (TOURNAMENT_BY_ID_QUERY, {"id": 0}),
+    (TOURNAMENT_SNAPSHOT_QUERY, {"id": 0}),
+    (GROUP_MEMBERS_CHECK_QUERY, {"groupe_id": 0, "player_ids": []}),
+]
+
+# Tables dont les colonnes sont validées à l'écriture (cf. cores.queries.checked_columns)
+WRITABLE_TABLES = ("players", "groupes", "matches", "tournaments")
+
+
+async def warm_connection(engine):
+    async with engine.connect() as conn:
+        for statement, params in WARM_STATEMENTS:
+            await conn.execute(statement, params)
+
+
+async def warm_engine(engine) -> int:
+    """Ouvre DB_POOL_WARM connexions en parallèle (elles restent ensuite dans le pool)."""
+    await asyncio.gather(*(warm_connection(engine) for _ in range(DB_POOL_WARM)))
+    return DB_POOL_WARM
+
+
+class Warmup:
+    """Chauffe du processus, lancée en tâche de fond par le lifespan.
+
+    Tant qu'elle n'est pas terminée, /readyz répond 503 et le load balancer
+    n'envoie pas de trafic ; /healthz répond dès le démarrage du serveur."""
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.report = {}
+        self.task = None
+
+    def start(self):
+        self.ready.clear()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def wait(self):
+        await self.ready.wait()
+
+    async def run(self):
+        started = time.perf_counter()
+        report = {"import_seconds": round(started - PROCESS_STARTED, 3), "connections": {}}
+
+        # Primaire : indispensable pour répondre, on réessaie jusqu'à ce qu'il soit joignable
+        while True:
+            try:
+                report["connections"]["primary"] = await warm_engine(database.engine)
+                async with database.AsyncSessionLocal() as session:
+                    for table in WRITABLE_TABLES:
+                        await table_columns(table, session)
+                break
+            except Exception as e:
+                print("Warmup : primary unavailable, retrying : ", e)
+                await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+        # Réplicas : facultatifs, les lectures basculent sur le primaire
+        for replica in database.replicas:
+            try:
+                report["connections"][replica.name] = await warm_engine(replica.engine)
+            except Exception as e:
+                print("Warmup : replica unavailable : ", replica.name, e)
+                report["connections"][replica.name] = 0
+
+        finished = time.perf_counter()
+        report["warmup_seconds"] = round(finished - started, 3)
+        report["cold_start_seconds"] = round(finished - PROCESS_STARTED, 3)
+        report["statements"] = len(WARM_STATEMENTS)
+        self.report = report
+        self.ready.set()
+        print("Cold start : ", dumps(report).decode())
+
+        # Hors du chemin de /readyz : les ratings (tout l'historique des matches) se chargent
+        # une fois le worker prêt ; une route qui en a besoin avant attend ce même chargement.
+        # Les classements des tournois se chargent à leur première lecture (RankingEngine.get_ranking).
+        started = time.perf_counter()
+        try:
+            await rating_engine.ensure_loaded()
+            print("Ratings loaded : ", round(time.perf_counter() - started, 3), "s")
+        except Exception as e:
+            print("Rating engine warmup failed : ", e)
+
+
+warmup = Warmup()
@@ -1,10 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+import contextvars
 import os
-from dotenv import load_dotenv
+import time
+
+from cores.config import env_bool
 
-# Load environment variables from .env file
-load_dotenv()
 
 # Configuration de la connexion PostgreSQL
 PG_HOST = os.getenv("PG_HOST", "localhost")
@@ -13,11 +16,81 @@ PG_USER = os.getenv("PG_USER", "playerz")
 PG_PASSWORD = os.getenv("PG_PASSWORD", "playerz")
 PG_DBNAME = os.getenv("PG_DBNAME", "playerz")
 
-print("db in : ", PG_HOST)
+# Configuration du pool de connexions
+DB_ECHO = env_bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
+# Réplicas en lecture ("host1,host2:5433"), mêmes identifiants que le primaire
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+# Durée pendant laquelle un client qui vient d'écrire lit sur le primaire
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+# Durée d'écartement d'un réplica injoignable
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+
+class PoolStats:
+    """Compteurs cumulés sur l'acquisition des connexions du pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, overflow: bool):
+        self.checkouts += 1
+        self.wait_total += wait
+        if wait > self.wait_max:
+            self.wait_max = wait
+        if overflow:
+            self.overflow_checkouts += 1
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Pool asyncio qui mesure le temps d'attente pour obtenir une connexion."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        pool_stats.record(time.perf_counter() - start, self.overflow() > 0)
+        return connection
+
+
+def database_url(host: str, port: str) -> str:
+    return f"postgresql+asyncpg://{PG_USER}:{PG_PASSWORD}@{host}:{port}/{PG_DBNAME}"
+
+
+def make_engine(url: str, poolclass=AsyncAdaptedQueuePool):
+    return create_async_engine(
+        url,
+        echo=DB_ECHO,
+        poolclass=poolclass,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        # Cache des requêtes préparées par le dialecte SQLAlchemy (connection.prepare()),
+        # par connexion ; le statement_cache_size d'asyncpg ne concerne pas ces requêtes
+        connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+    )
+
 
 # Création de l'engine SQLAlchemy
-DATABASE_URL = f"postgresql+asyncpg://{PG_USER}:{PG_PASSWORD}@{PG_HOST}:{PG_PORT}/{PG_DBNAME}"
-engine = create_async_engine(DATABASE_URL, echo=True)
+DATABASE_URL = database_url(PG_HOST, PG_PORT)
+engine = make_engine(DATABASE_URL, poolclass=InstrumentedQueuePool)
 
 # Création de la session
 AsyncSessionLocal = sessionmaker(
@@ -26,7 +99,151 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
-# Dépendance pour obtenir une session de base de données
+
+class Replica:
+    def __init__(self, host: str):
+        host, _, port = host.partition(":")
+        self.name = f"{host}:{port or PG_PORT}"
+        self.engine = make_engine(database_url(host, port or PG_PORT))
+        self.down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+
+replicas = [Replica(host) for host in DB_REPLICA_HOSTS]
+_next_replica = 0
+
+# Vrai pendant une requête d'un client qui vient d'écrire (cf. ReadYourWritesMiddleware)
+prefer_primary = contextvars.ContextVar("prefer_primary", default=False)
+
+
+def _pick_replica():
+    """Réplica suivant (tourniquet) parmi ceux disponibles, ou None."""
+    global _next_replica
+    for _ in range(len(replicas)):
+        replica = replicas[_next_replica % len(replicas)]
+        _next_replica += 1
+        if replica.available:
+            return replica
+    return None
+
+
+# Dépendance pour obtenir une session de base de données (primaire : écritures)
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+class ReadSession(AsyncSession):
+    """Session de lecture : un réplica si possible, sinon le primaire.
+
+    La base est choisie à la première requête, pas à l'ouverture : une route
+    servie par le cache n'emprunte aucune connexion. Un réplica injoignable est
+    écarté pendant DB_REPLICA_RETRY_SECONDS ; un pool de réplica saturé
+    (PoolTimeoutError) renvoie sur le primaire sans écarter le réplica."""
+
+    routed = False
+
+    async def _route(self):
+        if self.routed:
+            return
+        self.routed = True
+        while not prefer_primary.get():
+            replica = _pick_replica()
+            if replica is None:
+                break
+            self._bind_to(replica.engine)
+            try:
+                await AsyncSession.connection(self)
+                return
+            except PoolTimeoutError as e:
+                await self.close()
+                print("Replica pool exhausted : ", replica.name, e)
+                break
+            except (DBAPIError, OSError) as e:
+                await self.close()
+                replica.down_until = time.monotonic() + DB_REPLICA_RETRY_SECONDS
+                print("Replica unavailable : ", replica.name, e)
+        self._bind_to(engine)
+
+    def _bind_to(self, target_engine):
+        self.bind = target_engine
+        self.sync_session.bind = target_engine.sync_engine
+
+    async def connection(self, *args, **kwargs):
+        await self._route()
+        return await super().connection(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        await self._route()
+        return await super().execute(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        await self._route()
+        return await super().scalar(*args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        await self._route()
+        return await super().scalars(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        await self._route()
+        return await super().get(*args, **kwargs)
+
+    async def stream(self, *args, **kwargs):
+        await self._route()
+        return await super().stream(*args, **kwargs)
+
+
+ReadSessionLocal = sessionmaker(
+    bind=engine,
+    class_=ReadSession,
+    expire_on_commit=False
+)
+
+
+async def open_read_session() -> AsyncSession:
+    return ReadSessionLocal()
+
+
+# Dépendance des routes GET
+async def get_read_db():
+    session = await open_read_session()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+def get_pool_status() -> dict:
+    """Etat instantané du pool et compteurs d'attente depuis le démarrage."""
+    pool = engine.sync_engine.pool
+    checkouts = pool_stats.checkouts
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts_total": checkouts,
+        "overflow_checkouts_total": pool_stats.overflow_checkouts,
+        "timeouts_total": pool_stats.timeouts,
+        "wait_seconds_total": round(pool_stats.wait_total, 6),
+        "wait_seconds_avg": round(pool_stats.wait_total / checkouts, 6) if checkouts else 0.0,
+        "wait_seconds_max": round(pool_stats.wait_max, 6),
+    }
+
+
+def get_replicas_status() -> list:
+    now = time.monotonic()
+    return [
+        {
+            "name": replica.name,
+            "available": replica.available,
+            "retry_in_seconds": round(max(replica.down_until - now, 0.0), 1),
+            "checked_out": replica.engine.sync_engine.pool.checkedout(),
+        }
+        for replica in replicas
+    ]
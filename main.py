@@ -1,10 +1,21 @@
-import mimetypes
+import cores.config  # noqa: F401  (en premier : charge .env)
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request
 from typing import Optional, List
 
-from fastapi.responses import FileResponse
-from cores.storage import upload_file_to_storage
+from fastapi.responses import FileResponse, Response
+from cores.storage import UploadSizeLimitMiddleware, UploadTooLarge, upload_file_to_storage
+from cores.cache import response_cache
+from cores.files import file_metadata_cache, is_not_modified
+from cores.images import AVATAR_SIZES, schedule_derivatives, shutdown_executor, variant_filename
+from cores.realtime import socket_app, stop_ranking_pushes
+from cores.metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, instrument_engine, render_metrics
+from cores.consistency import ReadYourWritesMiddleware
+from cores.queries import UnknownColumns
+from cores.slow_queries import recent_slow_queries, watch_engine
+from cores.serialization import FastJSONResponse, FastJSONRoute
+from cores.warmup import warmup
 from routes.players import router as players_router
 from routes.groupes import router as groupes_router
 from routes.tournaments import router as tournaments_router
@@ -13,16 +24,30 @@ from routes.matches import router as matches_router
 from datetime import datetime, UTC
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-from dotenv import load_dotenv
+import database
 
-load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Chauffe en tâche de fond : le serveur répond à /healthz pendant ce temps, /readyz ensuite
+    warmup.start()
+    yield
+    await warmup.stop()
+    await stop_ranking_pushes()
+    await response_cache.close()
+    shutdown_executor()
+    for db_engine in [database.engine, *(replica.engine for replica in database.replicas)]:
+        await db_engine.dispose()
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+# Les routes déclarées ci-dessous sur l'application passent aussi par orjson
+app.router.route_class = FastJSONRoute
 app.include_router(players_router, prefix="/players")
 app.include_router(groupes_router, prefix="/groupes")
 app.include_router(tournaments_router, prefix="/tournaments")
 app.include_router(games_router, prefix="/games")
 app.include_router(matches_router, prefix="/matches")
+app.mount("/ws", socket_app)
 
 if os.getenv('ENVIRONEMENT') == 'LOCAL':
     print("ENVIRONEMENT IS LOCAL")
@@ -31,6 +56,13 @@ else:
     print("ENVIRONEMENT IS ONLINE")
     app.add_middleware(HTTPSRedirectMiddleware)
 
+@app.exception_handler(UnknownColumns)
+async def unknown_columns_handler(request: Request, exc: UnknownColumns):
+    # Clé du body absente de la table : refusée avant d'atteindre le SQL
+    return FastJSONResponse(status_code=400, content={"detail": str(exc)})
+
+# Avant CORS : le 413 d'un upload trop gros porte aussi les en-têtes CORS
+app.add_middleware(UploadSizeLimitMiddleware, paths=("/upload-image",))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -38,11 +70,39 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+# En dernier : le plus externe, il mesure aussi le temps passé dans les autres middlewares
+app.add_middleware(MetricsMiddleware)
+for db_engine in [database.engine, *(replica.engine for replica in database.replicas)]:
+    instrument_engine(db_engine)
+    watch_engine(db_engine)
 
 @app.get("/")
 async def read_root():
     return {"message": "PlayerZ 🔥 , by Rayan Rav & Innovita 🤖"}
 
+@app.get("/healthz")
+async def healthz():
+    return {"message": "SUCCESS"}
+
+@app.get("/readyz")
+async def readyz():
+    if not warmup.ready.is_set():
+        return FastJSONResponse(status_code=503, content={"message": "NOT_READY"})
+    return {"message": "SUCCESS", "warmup": warmup.report}
+
+@app.get("/db/pool")
+async def get_db_pool_status():
+    return {"message": "SUCCESS", "pool": database.get_pool_status(), "replicas": database.get_replicas_status()}
+
+@app.get("/db/slow-queries")
+async def get_slow_queries():
+    return {"message": "SUCCESS", "slow_queries": list(reversed(recent_slow_queries))}
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(render_metrics(database.get_pool_status()), media_type=PROMETHEUS_CONTENT_TYPE)
+
 upload_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "uploads", "files"))
 
 @app.post("/upload-image")
@@ -58,8 +118,15 @@ async def upload_image(file: UploadFile = File(...)):
 
     try:
         file_url = await upload_file_to_storage(file, upload_dir)
-        return {"message": "SUCCESS", "file_url": file_url}
+        # Déclinaisons (miniatures) générées hors de la boucle d'événements
+        schedule_derivatives(os.path.join(upload_dir, file_url.rsplit("/", 1)[-1]))
+        return {"message": "SUCCESS", "file_url": file_url, "sizes": list(AVATAR_SIZES)}
        
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Fichier trop volumineux: {str(e)}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -67,14 +134,33 @@ async def upload_image(file: UploadFile = File(...)):
         )
 
 @app.get("/file/{filename}")
-async def get_file(filename: str):
-    file_path = os.path.join(upload_dir, filename)
-
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
+async def get_file(filename: str, request: Request, size: Optional[int] = None):
+    if os.path.basename(filename) != filename:
         raise HTTPException(status_code=404, detail="Fichier non trouvé ou chemin invalide")
 
-    media_type, _ = mimetypes.guess_type(file_path)
-    if media_type is None:
-        media_type = "application/octet-stream"
+    if size is not None and size not in AVATAR_SIZES:
+        raise HTTPException(status_code=400, detail=f"Taille non supportée, valeurs possibles : {list(AVATAR_SIZES)}")
+
+    file_path = os.path.join(upload_dir, filename)
+    meta = None
+    if size is not None:
+        meta = file_metadata_cache.get(os.path.join(upload_dir, variant_filename(filename, size)))
+    if meta is None:
+        meta = file_metadata_cache.get(file_path)
+        if meta is None:
+            raise HTTPException(status_code=404, detail="Fichier non trouvé ou chemin invalide")
+        if size is not None:
+            # Déclinaison absente (image antérieure au pipeline) : servir l'original et la générer.
+            # Réponse non cacheable et sans validateur : l'URL de la déclinaison ne doit pas
+            # rester associée à l'original une fois la déclinaison créée
+            schedule_derivatives(file_path)
+            response = FileResponse(meta.path, media_type=meta.media_type, headers={"cache-control": "no-store"}, stat_result=meta.stat_result)
+            del response.headers["etag"]
+            del response.headers["last-modified"]
+            return response
+
+    if is_not_modified(request.headers, meta):
+        return Response(status_code=304, headers=meta.headers())
 
-    return FileResponse(file_path, media_type=media_type)
\ No newline at end of file
+    # FileResponse gère les requêtes Range / If-Range
+    return FileResponse(meta.path, media_type=meta.media_type, headers=meta.headers(), stat_result=meta.stat_result)
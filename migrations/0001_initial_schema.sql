@@ -0,0 +1,132 @@
+-- Schéma de base de l'API. IF NOT EXISTS : sans effet sur une base déjà en place.
+CREATE SCHEMA IF NOT EXISTS playerz;
+
+CREATE TABLE IF NOT EXISTS playerz.players (
+    id SERIAL PRIMARY KEY,
+    pseudo TEXT NOT NULL,
+    have_avatar BOOLEAN NOT NULL DEFAULT FALSE,
+    avatar_url TEXT
+);
+
+CREATE TABLE IF NOT EXISTS playerz.groupes (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS playerz.player_groupes (
+    player_id INTEGER NOT NULL REFERENCES playerz.players (id) ON DELETE CASCADE,
+    groupe_id INTEGER NOT NULL REFERENCES playerz.groupes (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS playerz.tournaments (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    status TEXT NOT NULL DEFAULT 'Non commencé',
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS playerz.tournament_players (
+    tournament_id INTEGER NOT NULL REFERENCES playerz.tournaments (id) ON DELETE CASCADE,
+    player_id INTEGER NOT NULL REFERENCES playerz.players (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS playerz.sessions (
+    id SERIAL PRIMARY KEY,
+    tournament_id INTEGER NOT NULL REFERENCES playerz.tournaments (id) ON DELETE CASCADE,
+    reference TEXT
+);
+
+CREATE TABLE IF NOT EXISTS playerz.matches (
+    id SERIAL PRIMARY KEY,
+    session_id INTEGER REFERENCES playerz.sessions (id) ON DELETE CASCADE,
+    t1j1 INTEGER REFERENCES playerz.players (id) ON DELETE SET NULL,
+    t1j2 INTEGER REFERENCES playerz.players (id) ON DELETE SET NULL,
+    t2j1 INTEGER REFERENCES playerz.players (id) ON DELETE SET NULL,
+    t2j2 INTEGER REFERENCES playerz.players (id) ON DELETE SET NULL,
+    terrain_name TEXT,
+    status TEXT NOT NULL DEFAULT 'Non commencé',
+    score_team_one INTEGER,
+    score_team_two INTEGER
+);
+
+-- Classement d'un tournoi lu par GET /tournaments/{id}/ranking. Créée seulement si
+-- absente : une base existante garde sa définition. Mêmes colonnes et même ordre
+-- que le moteur en mémoire (cores/ranking.py) : victoires, différence de points,
+-- points marqués (décroissants), puis id joueur.
+DO $$
+BEGIN
+    IF to_regprocedure('get_tournament_ranking(integer)') IS NULL THEN
+        CREATE FUNCTION playerz.get_tournament_ranking(p_tournament_id INTEGER)
+        RETURNS TABLE (
+            rank BIGINT,
+            player_id INTEGER,
+            pseudo TEXT,
+            played BIGINT,
+            wins BIGINT,
+            draws BIGINT,
+            losses BIGINT,
+            points_for BIGINT,
+            points_against BIGINT,
+            point_diff BIGINT
+        )
+        LANGUAGE sql STABLE
+        AS $function$
+            WITH scored_matches AS (
+                SELECT m.*
+                FROM playerz.matches m
+                JOIN playerz.sessions s ON s.id = m.session_id
+                WHERE s.tournament_id = p_tournament_id
+                    AND m.status <> 'Non commencé'
+                    AND m.score_team_one IS NOT NULL
+                    AND m.score_team_two IS NOT NULL
+            ),
+            results AS (
+                -- Une ligne par joueur et par match : points marqués / encaissés par son équipe
+                SELECT team.player_id, team.scored, team.conceded
+                FROM scored_matches m
+                CROSS JOIN LATERAL (VALUES
+                    (m.t1j1, m.score_team_one, m.score_team_two),
+                    (m.t1j2, m.score_team_one, m.score_team_two),
+                    (m.t2j1, m.score_team_two, m.score_team_one),
+                    (m.t2j2, m.score_team_two, m.score_team_one)
+                ) AS team (player_id, scored, conceded)
+                WHERE team.player_id IS NOT NULL
+            ),
+            players AS (
+                SELECT tp.player_id FROM playerz.tournament_players tp WHERE tp.tournament_id = p_tournament_id
+                UNION
+                SELECT r.player_id FROM results r
+            ),
+            stats AS (
+                SELECT
+                    pl.player_id,
+                    count(r.player_id) AS played,
+                    count(*) FILTER (WHERE r.scored > r.conceded) AS wins,
+                    count(*) FILTER (WHERE r.scored = r.conceded) AS draws,
+                    count(*) FILTER (WHERE r.scored < r.conceded) AS losses,
+                    COALESCE(sum(r.scored), 0)::BIGINT AS points_for,
+                    COALESCE(sum(r.conceded), 0)::BIGINT AS points_against
+                FROM players pl
+                LEFT JOIN results r ON r.player_id = pl.player_id
+                GROUP BY pl.player_id
+            )
+            SELECT
+                row_number() OVER (
+                    ORDER BY st.wins DESC, st.points_for - st.points_against DESC, st.points_for DESC, st.player_id
+                ) AS rank,
+                st.player_id,
+                p.pseudo,
+                st.played,
+                st.wins,
+                st.draws,
+                st.losses,
+                st.points_for,
+                st.points_against,
+                st.points_for - st.points_against AS point_diff
+            FROM stats st
+            LEFT JOIN playerz.players p ON p.id = st.player_id
+            ORDER BY rank
+        $function$;
+    END IF;
+END
+$$;
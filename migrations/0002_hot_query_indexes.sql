@@ -0,0 +1,15 @@
+-- Index des recherches faites à chaque requête par les routes et les moteurs en mémoire.
+
+-- matches WHERE session_id IN (...) / JOIN sessions ON s.id = m.session_id
+CREATE INDEX IF NOT EXISTS matches_session_id_idx ON playerz.matches (session_id);
+
+-- sessions WHERE tournament_id = :id
+CREATE INDEX IF NOT EXISTS sessions_tournament_id_idx ON playerz.sessions (tournament_id);
+
+-- tournament_players WHERE tournament_id = :id (comptage des joueurs, classement)
+CREATE INDEX IF NOT EXISTS tournament_players_tournament_id_idx
+    ON playerz.tournament_players (tournament_id, player_id);
+
+-- player_groupes WHERE groupe_id = ANY(:ids)
+CREATE INDEX IF NOT EXISTS player_groupes_groupe_id_idx
+    ON playerz.player_groupes (groupe_id, player_id);
@@ -0,0 +1,19 @@
+-- Un joueur n'appartient qu'une fois à un groupe : supprimer les doublons
+-- existants puis poser la contrainte, utilisée par ON CONFLICT DO NOTHING.
+DELETE FROM playerz.player_groupes
+WHERE ctid NOT IN (
+    SELECT min(ctid)
+    FROM playerz.player_groupes
+    GROUP BY player_id, groupe_id
+);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'player_groupes_player_groupe_key'
+    ) THEN
+        ALTER TABLE playerz.player_groupes
+            ADD CONSTRAINT player_groupes_player_groupe_key UNIQUE (player_id, groupe_id);
+    END IF;
+END
+$$;
@@ -1,16 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
-from sqlalchemy.future import select
-from sqlalchemy import insert, delete, Column, Integer, String
+from sqlalchemy import insert, Column, Integer, String
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
 import database
+from cores.scheduling import round_robin, swiss_pairing, split_into_sessions
+from cores.teams import balanced_pairs, strength_gap
+from cores.ratings import INITIAL_RATING, rating_engine
+from cores.cache import response_cache
+from cores.serialization import FastJSONRoute, rows_to_dicts
+import numpy as np
 from sqlalchemy.ext.declarative import declarative_base
 import random
 import uuid
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
 
 Base = declarative_base()
 
@@ -60,7 +65,7 @@ class PlayerGroupAddMultiple(BaseModel):
     groupe_id: int
     
 @router.get("/session/{id}")
-async def get_all_session_of_tournament(id: int, db: AsyncSession = Depends(database.get_db)):
+async def get_all_session_of_tournament(id: int, db: AsyncSession = Depends(database.get_read_db)):
     try:
         # Check if the tournament exists
         tournament_query = text("SELECT 1 FROM playerz.tournaments WHERE id = :id")
@@ -149,91 +154,92 @@ async def create_session_with_matches(session_data: SessionCreate, db: AsyncSess
         await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+# Validation d'un ajout au groupe en une requête : existence du groupe et joueurs connus
+GROUP_MEMBERS_CHECK_QUERY = text("""
+    SELECT
+        EXISTS (SELECT 1 FROM playerz.groupes WHERE id = :groupe_id) AS groupe_exists,
+        ARRAY(SELECT id FROM playerz.players WHERE id = ANY(:player_ids)) AS found_ids
+""")
+
+# Un seul INSERT pour tous les joueurs ; les appartenances existantes sont
+# ignorées grâce à la contrainte UNIQUE (player_id, groupe_id)
+ADD_GROUP_MEMBERS_QUERY = text("""
+    INSERT INTO playerz.player_groupes (player_id, groupe_id)
+    SELECT player_id, :groupe_id FROM unnest(CAST(:player_ids AS integer[])) AS player_id
+    ON CONFLICT (player_id, groupe_id) DO NOTHING
+""")
+
+async def add_group_members(groupe_id: int, player_ids: List[int], db: AsyncSession):
+    """Ajoute des joueurs à un groupe, sans commit ; lève 404 si le groupe ou un joueur n'existe pas."""
+    player_ids = list(dict.fromkeys(player_ids))
+    if not player_ids:
+        return
+    result = await db.execute(GROUP_MEMBERS_CHECK_QUERY, {"groupe_id": groupe_id, "player_ids": player_ids})
+    groupe_exists, found_ids = result.one()
+    if not groupe_exists:
+        raise HTTPException(status_code=404, detail="GROUP NOT FOUND")
+
+    found_ids = set(found_ids)
+    missing = [player_id for player_id in player_ids if player_id not in found_ids]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Player with ID {missing[0]} not found")
+
+    await db.execute(ADD_GROUP_MEMBERS_QUERY, {"groupe_id": groupe_id, "player_ids": player_ids})
+
 @router.post("/player/groupe/add")
 async def add_player_to_group(data: PlayerGroupAdd, db: AsyncSession = Depends(database.get_db)):
     try:
-        # Insert player into group
-        query = insert(database.PlayerGroup).values(
-            player_id=data.player_id,
-            groupe_id=data.groupe_id
-        )
-        await db.execute(query)
+        await add_group_members(data.groupe_id, [data.player_id], db)
         await db.commit()
+        await response_cache.invalidate("groupes")
         return {"message": "Player added to group successfully"}
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+REMOVE_GROUP_MEMBER_QUERY = text("""
+    DELETE FROM playerz.player_groupes
+    WHERE player_id = :player_id AND groupe_id = :groupe_id
+""")
+
+GROUP_MEMBERS_QUERY = text("SELECT * FROM playerz.player_groupes WHERE groupe_id = :groupe_id")
+
 @router.delete("/player/groupe/remove")
 async def remove_player_from_group(data: PlayerGroupAdd, db: AsyncSession = Depends(database.get_db)):
     try:
         # Remove player from group
-        query = delete(database.PlayerGroup).where(
-            database.PlayerGroup.player_id == data.player_id,
-            database.PlayerGroup.groupe_id == data.groupe_id
-        )
-        await db.execute(query)
+        await db.execute(REMOVE_GROUP_MEMBER_QUERY, {"player_id": data.player_id, "groupe_id": data.groupe_id})
         await db.commit()
+        await response_cache.invalidate("groupes")
         return {"message": "Player removed from group successfully"}
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/player/groupe/{groupe_id}")
-async def get_players_in_group(groupe_id: int, db: AsyncSession = Depends(database.get_db)):
+async def get_players_in_group(groupe_id: int, db: AsyncSession = Depends(database.get_read_db)):
     try:
         # Get all players in the specified group
-        query = select(database.PlayerGroup).where(database.PlayerGroup.groupe_id == groupe_id)
-        result = await db.execute(query)
+        result = await db.execute(GROUP_MEMBERS_QUERY, {"groupe_id": groupe_id})
         players = result.fetchall()
         
         if not players:
             raise HTTPException(status_code=404, detail="No players found in the specified group")
         
-        return {"players": [dict(player) for player in players]}
+        return {"players": rows_to_dicts(result, players)}
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.post("/player/groupe/add_multiple")
 async def add_players_to_group(data: PlayerGroupAddMultiple, db: AsyncSession = Depends(database.get_db)):
     try:
-        # Check if the group exists
-        group_query = select(Group).where(Group.id == data.groupe_id)
-        group_result = await db.execute(group_query)
-        group_exists = group_result.scalar()
-
-        if not group_exists:
-            raise HTTPException(status_code=404, detail="GROUP NOT FOUND")
-
-        # Insert multiple players into group
-        for player_id in data.player_ids:
-            # Check if the player exists
-            player_query = select(Player).where(Player.id == player_id)
-            player_result = await db.execute(player_query)
-            player_exists = player_result.scalar()
-
-            if not player_exists:
-                raise HTTPException(status_code=404, detail=f"Player with ID {player_id} not found")
-            
-            # Insert player into group
-            query = insert(PlayerGroup).values(
-                player_id=player_id,
-                groupe_id=data.groupe_id
-            )
-            await db.execute(query)
-        
-        # Remove duplicates
-        delete_duplicates_query = text("""
-            DELETE FROM playerz.player_groupes
-            WHERE ctid NOT IN (
-                SELECT min(ctid)
-                FROM playerz.player_groupes
-                GROUP BY player_id, groupe_id
-            )
-        """)
-        await db.execute(delete_duplicates_query)
-
+        await add_group_members(data.groupe_id, data.player_ids, db)
         await db.commit()
+        await response_cache.invalidate("groupes")
         return {"message": "SUCCESS"}
     except HTTPException as http_exc:
         raise http_exc
@@ -242,10 +248,31 @@ async def add_players_to_group(data: PlayerGroupAddMultiple, db: AsyncSession =
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/organize_teams")
-async def organize_teams(player_ids: List[int] = Body(...), is_random: bool = Body(False)):
+async def organize_teams(
+    player_ids: List[int] = Body(...),
+    is_random: bool = Body(False),
+    balanced: bool = Body(False),
+    ratings: Optional[Dict[int, float]] = Body(None),
+):
     if len(player_ids) < 2:
         raise HTTPException(status_code=400, detail="At least two players are required to form a team.")
 
+    if balanced:
+        # Equipes équilibrées à partir des forces fournies ou du classement Elo
+        if ratings is None:
+            await rating_engine.ensure_loaded()
+            ratings = {player_id: rating_engine.get(player_id) for player_id in player_ids}
+        strengths = np.array([ratings.get(player_id, INITIAL_RATING) for player_id in player_ids], dtype=float)
+        pairs, solo = balanced_pairs(strengths)
+
+        teams = []
+        for one, two in pairs.tolist():
+            teams.append({"player_one": player_ids[one], "player_two": player_ids[two], "code": str(uuid.uuid4()), "id": 0, "tournament_id": 0, "strength": float(strengths[one] + strengths[two])})
+        if solo is not None:
+            teams.append({"player_one": player_ids[solo], "player_two": 0, "code": str(uuid.uuid4()), "id": 0, "tournament_id": 0, "strength": float(strengths[solo])})
+
+        return {"message": "SUCCES", "teams": teams, "strength_gap": strength_gap(strengths, pairs)}
+
     # Shuffle the player IDs if is_random is True
     if is_random:
         random.shuffle(player_ids)
@@ -269,6 +296,9 @@ async def organize_sessions(
     team_codes: List[str] = Body(...),
     num_sessions: int = Body(...),
     matches_per_session: int = Body(...),
+    mode: str = Body("round_robin"),
+    team_scores: Optional[List[float]] = Body(None),
+    played_matches: Optional[List[List[str]]] = Body(None),
     db: AsyncSession = Depends(database.get_db)
 ):
     if len(team_codes) < 2:
@@ -277,24 +307,35 @@ async def organize_sessions(
     if num_sessions <= 0 or matches_per_session <= 0:
         raise HTTPException(status_code=400, detail="Number of sessions and matches per session must be greater than zero.")
 
-    # Organize matches into sessions
+    if len(set(team_codes)) != len(team_codes):
+        raise HTTPException(status_code=400, detail="Team codes must be unique.")
+
+    if mode == "round_robin":
+        # Chaque équipe rencontre toutes les autres, un match au plus par session
+        rounds = round_robin(len(team_codes))
+    elif mode == "swiss":
+        # Une ronde suisse : équipes de score proche, sans revanche si possible
+        if team_scores is not None and len(team_scores) != len(team_codes):
+            raise HTTPException(status_code=400, detail="team_scores must have one score per team.")
+        team_index = {code: i for i, code in enumerate(team_codes)}
+        played = [
+            (team_index[pair[0]], team_index[pair[1]])
+            for pair in (played_matches or [])
+            if len(pair) == 2 and pair[0] in team_index and pair[1] in team_index
+        ]
+        scores = team_scores if team_scores is not None else [0] * len(team_codes)
+        rounds = swiss_pairing(scores, played)[None, :, :]
+    else:
+        raise HTTPException(status_code=400, detail="Mode must be 'round_robin' or 'swiss'.")
+
     sessions = []
-    match_index = 0
-
-    for session_id in range(num_sessions):
-        session_matches = []
-        for _ in range(matches_per_session):
-            if match_index + 1 < len(team_codes):
-                session_matches.append({
-                    "team_one": team_codes[match_index],
-                    "team_two": team_codes[match_index + 1]
-                })
-                match_index += 2
-            else:
-                # Handle the case where there are not enough teams to form a match
-                break
-
-        if session_matches:
-            sessions.append({"session_id": session_id + 1, "matches": session_matches})
-
-    return {"message": "Sessions organized successfully", "sessions": sessions}
\ No newline at end of file
+    for session_id, session_pairs in enumerate(split_into_sessions(rounds, matches_per_session, num_sessions)):
+        sessions.append({
+            "session_id": session_id + 1,
+            "matches": [
+                {"team_one": team_codes[team_one], "team_two": team_codes[team_two]}
+                for team_one, team_two in session_pairs.tolist()
+            ],
+        })
+
+    return {"message": "Sessions organized successfully", "sessions": sessions}
@@ -1,54 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
+from typing import Optional
 import database
-from routes.games import PlayerGroupAddMultiple, add_players_to_group
+from cores.pagination import MAX_PAGE_SIZE, keyset_clause, ndjson_response, next_after_id
+from cores.cache import cached, response_cache
+from cores.queries import checked_columns, update_query
+from cores.serialization import FastJSONRoute, rows_to_dicts, row_to_dict
+from routes.games import add_group_members
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+GROUPES_PLAYERS_QUERY = text("""
+    SELECT pg.groupe_id AS _groupe_id, p.*
+    FROM playerz.players p
+    JOIN (
+        SELECT DISTINCT groupe_id, player_id
+        FROM playerz.player_groupes
+        WHERE groupe_id = ANY(:ids)
+    ) pg ON pg.player_id = p.id
+""")
+
+async def get_players_for_groupes(groupe_ids: list, db: AsyncSession) -> dict:
+    # Charger les joueurs de tous les groupes demandés en une seule requête
+    players_by_groupe = {groupe_id: [] for groupe_id in groupe_ids}
+    if not groupe_ids:
+        return players_by_groupe
+
+    players_result = await db.execute(GROUPES_PLAYERS_QUERY, {"ids": list(groupe_ids)})
+    columns = list(players_result.keys())[1:]
+    for row in players_result.fetchall():
+        players_by_groupe[row[0]].append(dict(zip(columns, row[1:])))
+    return players_by_groupe
 
 async def get_players_for_groupe(groupe_id: int, db: AsyncSession):
-    players_result = await db.execute(
-        text("SELECT * FROM players WHERE id IN (SELECT player_id FROM player_groupes WHERE groupe_id = :id)"), 
-        {"id": groupe_id}
-    )
-    players = players_result.fetchall()
-    columns = players_result.keys()
-    return [dict(zip(columns, player)) for player in players]
+    players_by_groupe = await get_players_for_groupes([groupe_id], db)
+    return players_by_groupe[groupe_id]
+
+async def attach_players(groupes_list: list, db: AsyncSession):
+    players_by_groupe = await get_players_for_groupes([groupe['id'] for groupe in groupes_list], db)
+    for groupe_dict in groupes_list:
+        groupe_dict['players'] = players_by_groupe[groupe_dict['id']]
 
 @router.get("/")
-async def get_all_groupes(db: AsyncSession = Depends(database.get_db)):
+@cached("groupes", "players")
+async def get_all_groupes(
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: AsyncSession = Depends(database.get_read_db)
+):
     try:
-        result = await db.execute(text("SELECT * FROM playerz.groupes"))
+        where, order_limit, params = keyset_clause(after_id, limit)
+        query = f"SELECT * FROM playerz.groupes {where} {order_limit}"
+        if stream:
+            return ndjson_response(query, params, enrich=attach_players)
+
+        result = await db.execute(text(query), params)
         groupes = result.fetchall()
         
         if not groupes:
             return {"message": "GROUPES_NOT_FOUND", "groupes": []}
         
-        columns = result.keys()
-        groupes_list = []
+        groupes_list = rows_to_dicts(result, groupes)
         
-        for groupe in groupes:
-            groupe_dict = dict(zip(columns, groupe))
-            groupe_dict['players'] = await get_players_for_groupe(groupe_dict['id'], db)
-            groupes_list.append(groupe_dict)
+        await attach_players(groupes_list, db)
         
-        return {"message": "SUCCES", "groupes": groupes_list}
+        response = {"message": "SUCCES", "groupes": groupes_list}
+        if limit is not None:
+            response["next_after_id"] = next_after_id(groupes_list, limit)
+        return response
     
     except Exception as e:
         return {"error": str(e)}
 
+GROUPE_BY_ID_QUERY = text("SELECT * FROM playerz.groupes WHERE id = :id")
+
 @router.get("/{id}")
-async def get_groupe_by_id(id: int, db: AsyncSession = Depends(database.get_db)):
+@cached("groupes", "players")
+async def get_groupe_by_id(id: int, db: AsyncSession = Depends(database.get_read_db)):
     try:
-        result = await db.execute(text("SELECT * FROM playerz.groupes WHERE id = :id"), {"id": id})
+        result = await db.execute(GROUPE_BY_ID_QUERY, {"id": id})
         groupe = result.fetchone()
         
         if groupe is None:
             return {"message": "GROUPES_NOT_FOUND", "groupe_dict": {}}
         
-        columns = result.keys()
-        groupe_dict = dict(zip(columns, groupe))
+        groupe_dict = row_to_dict(result, groupe)
         groupe_dict['players'] = await get_players_for_groupe(id, db)
         
         return {"message": "SUCCES", "groupe": groupe_dict}
@@ -63,6 +102,7 @@ async def create_groupe(groupe_data: dict, db: AsyncSession = Depends(database.g
         result = await db.execute(query, groupe_data)
         new_id = result.scalar()
         await db.commit()
+        await response_cache.invalidate("groupes")
         
         return {"message": "SUCCES", "groupe_data": {**groupe_data, "id": new_id}}
     
@@ -76,29 +116,32 @@ async def delete_groupe(id: int, db: AsyncSession = Depends(database.get_db)):
         query = text("DELETE FROM playerz.groupes WHERE id = :id")
         await db.execute(query, {"id": id})
         await db.commit()
+        await response_cache.invalidate("groupes")
         return {"message": "SUCCES"}
     
     except Exception as e:
         return {"error": str(e)}
 
+REMOVE_OTHER_MEMBERS_QUERY = text("""
+    DELETE FROM playerz.player_groupes
+    WHERE groupe_id = :id AND player_id <> ALL(CAST(:player_ids AS integer[]))
+""")
+
 @router.put("/{id}")
 async def update_groupe(id: int, groupe_data: dict, db: AsyncSession = Depends(database.get_db)):
+    columns = await checked_columns("groupes", groupe_data, db, exclude=("player_ids",))
     try:
         # Mettre à jour les données du groupe
-        set_clause = ", ".join([f"{key} = :{key}" for key in groupe_data.keys() if key != "player_ids"])
-        query = text(f"UPDATE playerz.groupes SET {set_clause} WHERE id = :id")
-        await db.execute(query, {**groupe_data, "id": id})
-        
-        # Supprimer les joueurs existants du groupe
-        delete_query = text("DELETE FROM player_groupes WHERE groupe_id = :id")
-        await db.execute(delete_query, {"id": id})
+        if columns:
+            await db.execute(update_query("groupes", columns), {**groupe_data, "id": id})
         
-        # Ajouter de nouveaux joueurs au groupe
+        # Appliquer seulement la différence : retirer les joueurs absents de la liste, ajouter les nouveaux
         player_ids = groupe_data.get("player_ids", [])
-        if player_ids:
-            await add_players_to_group(PlayerGroupAddMultiple(groupe_id=id, player_ids=player_ids), db)
+        await db.execute(REMOVE_OTHER_MEMBERS_QUERY, {"id": id, "player_ids": player_ids})
+        await add_group_members(id, player_ids, db)
         
         await db.commit()
+        await response_cache.invalidate("groupes")
         
         # Récupérer les joueurs mis à jour pour le groupe
         groupe_data['players'] = await get_players_for_groupe(id, db)
@@ -1,39 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
+from typing import List, Optional
 import database
 from pydantic import BaseModel
+from cores.pagination import MAX_PAGE_SIZE, keyset_clause, ndjson_response, next_after_id
+from cores.cache import cached, conditional, response_cache
+from cores.ranking import get_sessions_tournament_ids, ranking_engine
+from cores.ratings import rating_engine
+from cores.realtime import publish_match_updates
+from cores.queries import checked_columns, update_query, insert_query
+from cores.serialization import FastJSONRoute, rows_to_dicts, row_to_dict
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+async def on_matches_changed(matches_list: list, db: AsyncSession, publish: bool = True):
+    # Propager des matches écrits : classements, ratings, cache des lectures et abonnés temps réel.
+    # Tournois résolus en une requête et cache invalidé une fois pour tout le lot
+    tournament_ids = await get_sessions_tournament_ids([match.get("session_id") for match in matches_list], db)
+    matches_by_tournament = {}
+    for match_dict in matches_list:
+        ranking_engine.apply_match(match_dict)
+        rating_engine.apply_match(match_dict)
+        matches_by_tournament.setdefault(tournament_ids.get(match_dict.get("session_id")), []).append(match_dict)
+    await response_cache.invalidate("matches", "ratings", *(f"tournament:{t}" for t in matches_by_tournament))
+    if publish:
+        await publish_match_updates(matches_by_tournament)
 
 @router.get("/")
-async def get_all_matches(db: AsyncSession = Depends(database.get_db)):
-    query = text("SELECT * FROM playerz.matches ORDER BY id DESC")
-    result = await db.execute(query)
+@cached("matches")
+async def get_all_matches(
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    where, order_limit, params = keyset_clause(after_id, limit, descending=True)
+    query = f"SELECT * FROM playerz.matches {where} {order_limit}"
+    if stream:
+        return ndjson_response(query, params)
+
+    result = await db.execute(text(query), params)
     matches = result.fetchall()
 
     if not matches:
         return {"message": "MATCHES_NOT_FOUND", "matches": []}
 
-    columns = result.keys()
-    matches_list = [dict(zip(columns, match)) for match in matches]
-    return {"message": "SUCCESS", "matches": matches_list}
+    matches_list = rows_to_dicts(result, matches)
+    response = {"message": "SUCCESS", "matches": matches_list}
+    if limit is not None:
+        response["next_after_id"] = next_after_id(matches_list, limit)
+    return response
 
 @router.get("/{id}/in-tournament")
-async def get_match_by_id_tournament(id: int, db: AsyncSession = Depends(database.get_db)):
+@conditional
+@cached("tournament:{id}")
+async def get_match_by_id_tournament(id: int, db: AsyncSession = Depends(database.get_read_db)):
     query = text("select * from matches where session_id in (select id from sessions where tournament_id = :id)")
     result = await db.execute(query, {"id": id})
     matches = result.fetchall()
     if not matches:
         return {"message": "MATCHES_NOT_FOUND", "matches": []}
-    columns = result.keys()
-    matches_list = [dict(zip(columns, match)) for match in matches]
+    matches_list = rows_to_dicts(result, matches)
     return {"message": "SUCCESS", "matches": matches_list}
 
+MATCH_BY_ID_QUERY = text("SELECT * FROM playerz.matches WHERE id = :id")
+
 @router.get("/{id}")
-async def get_match_by_id(id: int, db: AsyncSession = Depends(database.get_db)):
-    query = text("SELECT * FROM playerz.matches WHERE id = :id")
-    result = await db.execute(query, {"id": id})
+@cached("matches")
+async def get_match_by_id(id: int, db: AsyncSession = Depends(database.get_read_db)):
+    result = await db.execute(MATCH_BY_ID_QUERY, {"id": id})
     match = result.fetchone()
 
     if not match:
@@ -41,43 +77,110 @@ async def get_match_by_id(id: int, db: AsyncSession = Depends(database.get_db)):
             status_code=status.HTTP_404_NOT_FOUND, detail="MATCH_NOT_FOUND"
         )
 
-    columns = result.keys()
-    match_dict = dict(zip(columns, match))
+    match_dict = row_to_dict(result, match)
     return {"message": "SUCCESS", "match": match_dict}
 
 @router.post("/")
 async def create_match(match_data: dict, db: AsyncSession = Depends(database.get_db)):
+    columns = await checked_columns("matches", match_data, db)
     try:
-        keys = ", ".join(match_data.keys())
-        values = ", ".join([f":{key}" for key in match_data.keys()])
-        query = text(
-            f"INSERT INTO playerz.matches ({keys}) VALUES ({values}) RETURNING id"
+        result = await db.execute(insert_query("matches", columns, "*"), match_data)
+        new_match = row_to_dict(result, result.fetchone())
+        await db.commit()
+        await on_matches_changed([new_match], db, publish=False)
+        return {"message": "MATCH_CREATED", "match_id": new_match["id"]}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
-        result = await db.execute(query, match_data)
-        new_match_id = result.scalar()
+
+class ScoreBatchItem(BaseModel):
+    match_id: int
+    team: Optional[int] = None
+    score: Optional[int] = None
+    status: Optional[str] = None
+
+BATCH_SCORE_UPDATE_QUERY = text(
+    """
+    UPDATE playerz.matches m SET
+        score_team_one = COALESCE(u.score_team_one, m.score_team_one),
+        score_team_two = COALESCE(u.score_team_two, m.score_team_two),
+        status = COALESCE(u.status, m.status)
+    FROM unnest(
+        CAST(:ids AS bigint[]),
+        CAST(:scores_one AS int[]),
+        CAST(:scores_two AS int[]),
+        CAST(:statuses AS text[])
+    ) AS u(id, score_team_one, score_team_two, status)
+    WHERE m.id = u.id
+    RETURNING m.*
+    """
+)
+
+@router.put("/scores")
+async def update_match_scores(
+    updates: List[ScoreBatchItem],
+    db: AsyncSession = Depends(database.get_db)
+):
+    if not updates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="NO_SCORE_UPDATES"
+        )
+
+    # Fusionner les mises à jour d'un même match (dernière valeur gagnante)
+    merged = {}
+    for update in updates:
+        if update.score is not None and update.team not in [1, 2]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="TEAM_NUMBER_MUST_BE_1_OR_2"
+            )
+        row = merged.setdefault(update.match_id, {"score_team_one": None, "score_team_two": None, "status": None})
+        if update.score is not None:
+            row["score_team_one" if update.team == 1 else "score_team_two"] = update.score
+        if update.status is not None:
+            row["status"] = update.status
+
+    try:
+        result = await db.execute(
+            BATCH_SCORE_UPDATE_QUERY,
+            {
+                "ids": list(merged),
+                "scores_one": [row["score_team_one"] for row in merged.values()],
+                "scores_two": [row["score_team_two"] for row in merged.values()],
+                "statuses": [row["status"] for row in merged.values()],
+            },
+        )
+        matches_list = rows_to_dicts(result, result.fetchall())
         await db.commit()
-        return {"message": "MATCH_CREATED", "match_id": new_match_id}
     except Exception as e:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
+    await on_matches_changed(matches_list, db)
+
+    updated_ids = {match["id"] for match in matches_list}
+    return {
+        "message": "MATCH_SCORES_UPDATED",
+        "matches": matches_list,
+        "not_found": [match_id for match_id in merged if match_id not in updated_ids],
+    }
+
 @router.put("/{id}")
 async def update_match(id: int, match_data: dict, db: AsyncSession = Depends(database.get_db)):
+    columns = await checked_columns("matches", match_data, db)
     try:
-        set_clause = ", ".join([f"{key} = :{key}" for key in match_data.keys()])
-        query = text(
-            f"UPDATE playerz.matches SET {set_clause} WHERE id = :id RETURNING *"
-        )
-        result = await db.execute(query, {**match_data, "id": id})
+        result = await db.execute(update_query("matches", columns, "*"), {**match_data, "id": id})
         updated_match = result.fetchone()
         await db.commit()
         if updated_match is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="MATCH_NOT_FOUND"
             )
-        columns = result.keys()
-        match_dict = dict(zip(columns, updated_match))
+        match_dict = row_to_dict(result, updated_match)
+        await on_matches_changed([match_dict], db)
         return {"message": "MATCH_UPDATED", "match": match_dict}
     except Exception as e:
         raise HTTPException(
@@ -95,8 +198,12 @@ async def delete_match(id: int, db: AsyncSession = Depends(database.get_db)):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="MATCH_NOT_FOUND"
             )
-        columns = result.keys()
-        match_dict = dict(zip(columns, deleted_match))
+        match_dict = row_to_dict(result, deleted_match)
+        ranking_engine.remove_match(id)
+        rating_engine.remove_match(id)
+        session_id = match_dict.get("session_id")
+        tournament_ids = await get_sessions_tournament_ids([session_id], db)
+        await response_cache.invalidate("matches", "ratings", f"tournament:{tournament_ids.get(session_id)}")
         return {"message": "MATCH_DELETED", "match": match_dict}
     except Exception as e:
         raise HTTPException(
@@ -121,12 +228,9 @@ async def update_match_score(
             )
         
         column_name = "score_team_one" if team_number == 1 else "score_team_two"
-        query = text(
-            f"UPDATE playerz.matches SET {column_name} = :score "
-            "WHERE id = :id RETURNING *"
-        )
+        query = update_query("matches", (column_name,), "*")
         
-        result = await db.execute(query, {"score": score_data.score, "id": id})
+        result = await db.execute(query, {column_name: score_data.score, "id": id})
         updated_match = result.fetchone()
         await db.commit()
         
@@ -136,8 +240,8 @@ async def update_match_score(
                 detail="MATCH_NOT_FOUND"
             )
             
-        columns = result.keys()
-        match_dict = dict(zip(columns, updated_match))
+        match_dict = row_to_dict(result, updated_match)
+        await on_matches_changed([match_dict], db)
         return {"message": "MATCH_SCORE_UPDATED", "match": match_dict}
         
     except Exception as e:
@@ -1,40 +1,79 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
+from typing import Optional
 import database
+from cores.pagination import MAX_PAGE_SIZE, keyset_clause, ndjson_response, next_after_id
+from cores.ranking import ranking_engine
+from cores.ratings import rating_engine
+from cores.cache import cached, response_cache
+from cores.queries import checked_columns, update_query
+from cores.serialization import FastJSONRoute, rows_to_dicts, row_to_dict
 import random
 import string
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+async def attach_ratings(players_list: list, db: AsyncSession):
+    await rating_engine.ensure_loaded()
+    for player in players_list:
+        player["rating"] = round(rating_engine.get(player["id"]), 2)
 
 @router.get("/")
-async def get_all_players(db: AsyncSession = Depends(database.get_db)):
+@cached("players", "ratings")
+async def get_all_players(
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: AsyncSession = Depends(database.get_read_db)
+):
     try:
-        result = await db.execute(text("SELECT * FROM playerz.players"))
+        where, order_limit, params = keyset_clause(after_id, limit)
+        query = f"SELECT * FROM playerz.players {where} {order_limit}"
+        if stream:
+            return ndjson_response(query, params, enrich=attach_ratings)
+
+        result = await db.execute(text(query), params)
         players = result.fetchall()
         
         if not players:
             return {"message": "PLAYERS_NOT_FOUND", "players": []}
         
-        columns = result.keys()
-        players_list = [dict(zip(columns, player)) for player in players]
+        players_list = rows_to_dicts(result, players)
+        await attach_ratings(players_list, db)
         
-        return {"message": "SUCCES", "players": players_list}
+        response = {"message": "SUCCES", "players": players_list}
+        if limit is not None:
+            response["next_after_id"] = next_after_id(players_list, limit)
+        return response
+    
+    except Exception as e:
+        return {"error": str(e)}
+
+@router.get("/ratings")
+@cached("ratings")
+async def get_player_ratings(limit: Optional[int] = Query(None, ge=1)):
+    try:
+        await rating_engine.ensure_loaded()
+        return {"message": "SUCCES", "ratings": rating_engine.leaderboard(limit)}
     
     except Exception as e:
         return {"error": str(e)}
 
+PLAYER_BY_ID_QUERY = text("SELECT * FROM playerz.players WHERE id = :id")
+
 @router.get("/{id}")
-async def get_player_by_id(id: int, db: AsyncSession = Depends(database.get_db)):
+@cached("players", "ratings")
+async def get_player_by_id(id: int, db: AsyncSession = Depends(database.get_read_db)):
     try:
-        result = await db.execute(text("SELECT * FROM playerz.players WHERE id = :id"), {"id": id})
+        result = await db.execute(PLAYER_BY_ID_QUERY, {"id": id})
         player = result.fetchone()
         
         if player is None:
             return {"message": "PLAYERS_NOT_FOUND", "player": {}}
         
-        columns = result.keys()
-        player_dict = dict(zip(columns, player))
+        player_dict = row_to_dict(result, player)
+        await attach_ratings([player_dict], db)
         
         return {"message": "SUCCES", "player": player_dict}
     
@@ -48,15 +87,37 @@ async def create_player(player_data: dict, db: AsyncSession = Depends(database.g
         result = await db.execute(query, player_data)
         new_id = result.scalar()
         await db.commit()
+        await response_cache.invalidate("players")
         
         return {"message": "SUCCESS", "player_data": {**player_data, "id": new_id}}
     
     except Exception as e:
         return {"error": str(e)}
 
+PLAYER_TOURNAMENTS_QUERY = text("SELECT DISTINCT tournament_id FROM playerz.tournament_players WHERE player_id = :id")
+
+# Tournois où le joueur est inscrit ou a joué : ses places dans les matches passent à NULL à sa suppression
+PLAYER_ALL_TOURNAMENTS_QUERY = text(
+    """
+    SELECT tournament_id FROM playerz.tournament_players WHERE player_id = :id
+    UNION
+    SELECT s.tournament_id FROM playerz.matches m
+    JOIN playerz.sessions s ON s.id = m.session_id
+    WHERE :id IN (m.t1j1, m.t1j2, m.t2j1, m.t2j2)
+    """
+)
+
+async def invalidate_player(tournament_ids: list, *tags):
+    # Les tournois du joueur embarquent son pseudo (détail, classement)
+    await response_cache.invalidate("players", *tags, *(f"tournament:{tournament_id}" for tournament_id in tournament_ids))
+
 @router.delete("/{id}")
 async def delete_player(id: int, db: AsyncSession = Depends(database.get_db)):
     try:
+        # Lu avant la suppression : tournament_players est vidé en cascade
+        result = await db.execute(PLAYER_ALL_TOURNAMENTS_QUERY, {"id": id})
+        tournament_ids = result.scalars().all()
+
         query = text("DELETE FROM playerz.players WHERE id = :id")
         await db.execute(query, {"id": id})
         await db.commit()
@@ -64,6 +125,8 @@ async def delete_player(id: int, db: AsyncSession = Depends(database.get_db)):
         query = text("DELETE FROM playerz.player_groupes WHERE player_id = :id")
         await db.execute(query, {"id": id})
         await db.commit()
+        # Cascade : nb_joueurs de la liste des tournois et places des matches changent
+        await invalidate_player(tournament_ids, "tournaments", "matches")
         
         return {"message": "SUCCESS"}
     
@@ -72,11 +135,14 @@ async def delete_player(id: int, db: AsyncSession = Depends(database.get_db)):
 
 @router.put("/{id}")
 async def update_player(id: int, player_data: dict, db: AsyncSession = Depends(database.get_db)):
+    columns = await checked_columns("players", player_data, db)
     try:
-        set_clause = ", ".join([f"{key} = :{key}" for key in player_data.keys()])
-        query = text(f"UPDATE playerz.players SET {set_clause} WHERE id = :id")
-        await db.execute(query, {**player_data, "id": id})
+        await db.execute(update_query("players", columns), {**player_data, "id": id})
         await db.commit()
+        if "pseudo" in player_data:
+            ranking_engine.rename_player(id, player_data["pseudo"])
+        result = await db.execute(PLAYER_TOURNAMENTS_QUERY, {"id": id})
+        await invalidate_player(result.scalars().all())
         return {"message": "SUCCESS"}
     
     except Exception as e:
@@ -1,52 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import text
 from sqlalchemy.engine.row import Row
+from sqlalchemy.types import JSON
+from typing import Optional
 import database
 from datetime import datetime, timedelta
+from cores.pagination import MAX_PAGE_SIZE, keyset_clause, ndjson_response, next_after_id
+from cores.ranking import RANKING_SOURCE, ranking_engine, read_ranking
+from cores.ratings import rating_engine
+from cores.cache import cached, conditional, response_cache
+from cores.queries import checked_columns, update_query, insert_query
+from cores.serialization import FastJSONRoute, rows_to_dicts, row_to_dict
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+# Nombre maximum de lignes par INSERT multi-lignes
+BULK_INSERT_CHUNK_SIZE = 1000
 
 
 @router.get("/")
-async def get_all_tournaments(db: AsyncSession = Depends(database.get_db)):
-    query = text(
-        """
+@cached("tournaments")
+async def get_all_tournaments(
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    db: AsyncSession = Depends(database.get_read_db),
+):
+    where, order_limit, params = keyset_clause(after_id, limit, descending=True, column="t.id")
+    query = f"""
         SELECT *,
             (select count(*) from playerz.tournament_players where tournament_id = t.id) 
             as nb_joueurs 
         FROM playerz.tournaments t 
-        ORDER BY id DESC
+        {where}
+        {order_limit}
     """
-    )
-    result = await db.execute(query)
+    if stream:
+        return ndjson_response(query, params)
+
+    result = await db.execute(text(query), params)
     tournaments = result.fetchall()
 
     if not tournaments:
         return {"message": "TOURNAMENTS_NOT_FOUND", "tournaments": []}
 
-    columns = result.keys()
-    tournaments_list = [dict(zip(columns, tournament)) for tournament in tournaments]
-    return {"message": "SUCCES", "tournaments": tournaments_list}
+    tournaments_list = rows_to_dicts(result, tournaments)
+    response = {"message": "SUCCES", "tournaments": tournaments_list}
+    if limit is not None:
+        response["next_after_id"] = next_after_id(tournaments_list, limit)
+    return response
 
 
 @router.get("/{id}/ranking")
-async def get_tournament_ranking(id: int, db: AsyncSession = Depends(database.get_db)):
-    query = text(
-        """
-        SELECT * FROM get_tournament_ranking(:id);
-        """
-    )
-    result = await db.execute(query, {"id": id})
-    ranking = result.fetchall()
-    columns = result.keys()
-    ranking_list = [dict(zip(columns, ranking)) for ranking in ranking]
+@conditional
+@cached("tournament:{id}")
+async def get_tournament_ranking(
+    id: int,
+    source: str = Query(RANKING_SOURCE, pattern="^(engine|sql)$"),
+    db: AsyncSession = Depends(database.get_read_db),
+):
+    ranking_list = await read_ranking(id, db, source)
     return {"message": "SUCCES", "ranking": ranking_list}
 
 
 @router.get("/sessions/{id}/in-tournament")
+@cached("tournament:{id}")
 async def get_session_by_id_tournament(
-    id: int, db: AsyncSession = Depends(database.get_db)
+    id: int, db: AsyncSession = Depends(database.get_read_db)
 ):
     query = text(
         """
@@ -61,24 +82,98 @@ async def get_session_by_id_tournament(
     sessions = result.fetchall()
     if not sessions:
         return {"message": "SESSIONS_NOT_FOUND", "sessions": []}
-    columns = result.keys()
-    sessions_list = [dict(zip(columns, session)) for session in sessions]
+    sessions_list = rows_to_dicts(result, sessions)
     return {"message": "SUCCESS", "sessions": sessions_list}
 
 
-@router.get("/{id}")
-async def get_tournament_by_id(id: int, db: AsyncSession = Depends(database.get_db)):
+# Arbre complet du tournoi (tournoi, joueurs, sessions -> matches) construit
+# par PostgreSQL en un seul aller-retour
+TOURNAMENT_SNAPSHOT_QUERY = text(
+    """
+    SELECT json_build_object(
+        'tournament', (
+            SELECT row_to_json(x) FROM (
+                SELECT t.*,
+                    (select count(*) from playerz.tournament_players where tournament_id = t.id)
+                    as nb_joueurs
+                FROM playerz.tournaments t
+                WHERE t.id = :id
+            ) x
+        ),
+        'players', COALESCE((
+            SELECT json_agg(p ORDER BY p.id)
+            FROM playerz.players p
+            WHERE p.id IN (
+                SELECT player_id FROM playerz.tournament_players WHERE tournament_id = :id
+            )
+        ), '[]'::json),
+        'sessions', COALESCE((
+            SELECT json_agg(
+                to_jsonb(s) || jsonb_build_object('matches', COALESCE((
+                    SELECT jsonb_agg(m ORDER BY m.id)
+                    FROM playerz.matches m
+                    WHERE m.session_id = s.id
+                ), '[]'::jsonb))
+                ORDER BY s.id
+            )
+            FROM playerz.sessions s
+            WHERE s.tournament_id = :id
+        ), '[]'::json)
+    ) AS snapshot
+    """
+).columns(snapshot=JSON)
 
-    query = text(
-        """
-        SELECT *,
-            (select count(*) from playerz.tournament_players where tournament_id = t.id) 
-            as nb_joueurs 
-        FROM playerz.tournaments t 
-        WHERE t.id = :id
+
+async def get_tournament_snapshot(id: int, db: AsyncSession):
+    result = await db.execute(TOURNAMENT_SNAPSHOT_QUERY, {"id": id})
+    snapshot = result.scalar()
+
+    if not snapshot["tournament"]:
+        return {
+            "message": "TOURNAMENT_NOT_FOUND",
+            "tournament": {},
+            "sessions": [],
+            "players": [],
+        }
+
+    return {"message": "SUCCES", **snapshot}
+
+
+TOURNAMENT_BY_ID_QUERY = text(
+    """
+    SELECT *,
+        (select count(*) from playerz.tournament_players where tournament_id = t.id)
+        as nb_joueurs
+    FROM playerz.tournaments t
+    WHERE t.id = :id
+    """
+)
+
+TOURNAMENT_PLAYERS_QUERY = text(
     """
+    SELECT * FROM playerz.players WHERE id IN (
+        SELECT player_id FROM playerz.tournament_players WHERE tournament_id = :id
     )
-    result = await db.execute(query, {"id": id})
+    """
+)
+
+TOURNAMENT_SESSIONS_QUERY = text("SELECT * FROM playerz.sessions WHERE tournament_id = :id")
+
+TOURNAMENT_MATCHES_QUERY = text(
+    "SELECT * FROM playerz.matches WHERE session_id IN (SELECT id FROM playerz.sessions WHERE tournament_id = :id)"
+)
+
+
+@router.get("/{id}")
+@conditional
+@cached("tournament:{id}")
+async def get_tournament_by_id(
+    id: int, snapshot: bool = False, db: AsyncSession = Depends(database.get_read_db)
+):
+    if snapshot:
+        return await get_tournament_snapshot(id, db)
+
+    result = await db.execute(TOURNAMENT_BY_ID_QUERY, {"id": id})
     tournament = result.fetchone()
 
     if not tournament:
@@ -90,24 +185,14 @@ async def get_tournament_by_id(id: int, db: AsyncSession = Depends(database.get_
             "players": [],
         }
 
-    columns = result.keys()
-    tournament_dict = dict(zip(columns, tournament))
+    tournament_dict = row_to_dict(result, tournament)
 
-    query = text(
-        """
-        SELECT * FROM playerz.players WHERE id IN (
-            SELECT player_id FROM playerz.tournament_players WHERE tournament_id = :id
-        )
-        """
-    )
-    result = await db.execute(query, {"id": id})
+    result = await db.execute(TOURNAMENT_PLAYERS_QUERY, {"id": id})
     players = result.fetchall()
 
-    columns = result.keys()
-    players_list = [dict(zip(columns, player)) for player in players]
+    players_list = rows_to_dicts(result, players)
 
-    query = text("SELECT * FROM playerz.sessions WHERE tournament_id = :id")
-    result = await db.execute(query, {"id": id})
+    result = await db.execute(TOURNAMENT_SESSIONS_QUERY, {"id": id})
     sessions = result.fetchall()
 
     if not sessions:
@@ -119,13 +204,9 @@ async def get_tournament_by_id(id: int, db: AsyncSession = Depends(database.get_
             "players": players_list,
         }
 
-    columns = result.keys()
-    sessions_list = [dict(zip(columns, session)) for session in sessions]
+    sessions_list = rows_to_dicts(result, sessions)
 
-    query = text(
-        "SELECT * FROM playerz.matches WHERE session_id IN (SELECT id FROM playerz.sessions WHERE tournament_id = :id)"
-    )
-    result = await db.execute(query, {"id": id})
+    result = await db.execute(TOURNAMENT_MATCHES_QUERY, {"id": id})
     matches = result.fetchall()
 
     if not matches:
@@ -137,8 +218,7 @@ async def get_tournament_by_id(id: int, db: AsyncSession = Depends(database.get_
             "players": players_list,
         }
 
-    columns = result.keys()
-    matches_list = [dict(zip(columns, match)) for match in matches]
+    matches_list = rows_to_dicts(result, matches)
 
     return {
         "message": "SUCCES",
@@ -153,6 +233,9 @@ async def get_tournament_by_id(id: int, db: AsyncSession = Depends(database.get_
 async def create_tournament(
     tournament_data: dict, db: AsyncSession = Depends(database.get_db)
 ):
+    columns = await checked_columns(
+        "tournaments", {**tournament_data, "status": None}, db, exclude=("players", "sessions", "matches")
+    )
     try:
         # Extract and remove 'players', 'sessions', and 'matches' from tournament_data
         players = tournament_data.pop("players", [])
@@ -166,50 +249,52 @@ async def create_tournament(
         tournament_data["status"] = "Non commencé"
 
         # Insert tournament data
-        keys = ", ".join(tournament_data.keys())
-        values = ", ".join([f":{key}" for key in tournament_data.keys()])
-        query = text(
-            f"INSERT INTO playerz.tournaments ({keys}) VALUES ({values}) RETURNING id"
-        )
-        result = await db.execute(query, tournament_data)
+        result = await db.execute(insert_query("tournaments", columns), tournament_data)
         new_tournament_id = result.scalar()
 
-        # Insert players into tournament_players table
-        for player_id in players:
+        # Insert players into tournament_players table (executemany, un seul aller-retour)
+        if players:
             player_query = text(
                 "INSERT INTO playerz.tournament_players (tournament_id, player_id) VALUES (:tournament_id, :player_id)"
             )
             await db.execute(
                 player_query,
-                {"tournament_id": new_tournament_id, "player_id": player_id},
+                [{"tournament_id": new_tournament_id, "player_id": player_id} for player_id in players],
             )
 
         # Insert sessions into sessions table and collect their IDs
         session_info = []
         session_id_map = {}
-        for session in sessions:
+        for i in range(0, len(sessions), BULK_INSERT_CHUNK_SIZE):
+            chunk = sessions[i:i + BULK_INSERT_CHUNK_SIZE]
+            rows = ", ".join(f"(:tournament_id, :reference_{n})" for n in range(len(chunk)))
             session_query = text(
-                "INSERT INTO playerz.sessions (tournament_id, reference) VALUES (:tournament_id, :reference) RETURNING id"
+                f"INSERT INTO playerz.sessions (tournament_id, reference) VALUES {rows} RETURNING id, reference"
             )
             session_result = await db.execute(
                 session_query,
-                {"tournament_id": new_tournament_id, "reference": session},
+                {"tournament_id": new_tournament_id, **{f"reference_{n}": session for n, session in enumerate(chunk)}},
             )
-            session_id = session_result.scalar()
-            session_info.append({"id_db": session_id, "ref": session})
-            session_id_map[session] = session_id
+            # RETURNING ne garantit pas l'ordre des VALUES : correspondance par référence
+            for session_id, reference in session_result.all():
+                session_id_map[reference] = session_id
+            for session in chunk:
+                session_info.append({"id_db": session_id_map[session], "ref": session})
 
-        # Insert matches into matches table
+        # Insert matches into matches table (executemany, un seul aller-retour)
         for match in matches:
             match["session_id"] = session_id_map.get(match["session_id"])
             match["status"] = "Non commencé"
+        if matches:
             match_query = text(
                 "INSERT INTO playerz.matches (session_id, t1j1, t1j2, t2j1, t2j2, terrain_name) "
                 "VALUES (:session_id, :t1j1, :t1j2, :t2j1, :t2j2, :terrain_name)"
             )
-            await db.execute(match_query, match)
+            await db.execute(match_query, matches)
 
         await db.commit()
+        # Un GET antérieur de cet id (TOURNAMENT_NOT_FOUND) a pu recevoir un ETag
+        await response_cache.invalidate("tournaments", f"tournament:{new_tournament_id}")
         return {"tournament_id": new_tournament_id, "sessions": session_info}
     except Exception as e:
         raise HTTPException(
@@ -217,9 +302,22 @@ async def create_tournament(
         )
 
 
+TOURNAMENT_MATCH_IDS_QUERY = text(
+    """
+    SELECT m.id FROM playerz.matches m
+    JOIN playerz.sessions s ON s.id = m.session_id
+    WHERE s.tournament_id = :id
+    """
+)
+
+
 @router.delete("/{id}")
 async def delete_tournament(id: int, db: AsyncSession = Depends(database.get_db)):
     try:
+        # Matches supprimés en cascade avec le tournoi : à retirer aussi des ratings
+        result = await db.execute(TOURNAMENT_MATCH_IDS_QUERY, {"id": id})
+        match_ids = result.scalars().all()
+
         query = text("DELETE FROM playerz.tournaments WHERE id = :id RETURNING *")
         result = await db.execute(query, {"id": id})
         deleted_tournament = result.fetchone()
@@ -228,8 +326,11 @@ async def delete_tournament(id: int, db: AsyncSession = Depends(database.get_db)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="TOURNAMENT_NOT_FOUND"
             )
-        columns = result.keys()
-        tournament_dict = dict(zip(columns, deleted_tournament))
+        tournament_dict = row_to_dict(result, deleted_tournament)
+        ranking_engine.drop(id)
+        for match_id in match_ids:
+            rating_engine.remove_match(match_id)
+        await response_cache.invalidate("tournaments", f"tournament:{id}", "matches", "ratings")
         return {"message": "TOURNAMENT_DELETED", "tournament": tournament_dict}
     except Exception as e:
         raise HTTPException(
@@ -241,20 +342,17 @@ async def delete_tournament(id: int, db: AsyncSession = Depends(database.get_db)
 async def update_tournament(
     id: int, tournament_data: dict, db: AsyncSession = Depends(database.get_db)
 ):
+    columns = await checked_columns("tournaments", tournament_data, db)
     try:
-        set_clause = ", ".join([f"{key} = :{key}" for key in tournament_data.keys()])
-        query = text(
-            f"UPDATE playerz.tournaments SET {set_clause} WHERE id = :id RETURNING *"
-        )
-        result = await db.execute(query, {**tournament_data, "id": id})
+        result = await db.execute(update_query("tournaments", columns, "*"), {**tournament_data, "id": id})
         updated_tournament = result.fetchone()
         await db.commit()
         if updated_tournament is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="TOURNAMENT_NOT_FOUND"
             )
-        columns = result.keys()
-        tournament_dict = dict(zip(columns, updated_tournament))
+        await response_cache.invalidate("tournaments", f"tournament:{id}")
+        tournament_dict = row_to_dict(result, updated_tournament)
         return {"message": "TOURNAMENT_UPDATED", "tournament": tournament_dict}
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,33 @@
+import asyncio
+import os
+
+import pytest
+
+# Le cache de réponses masquerait les requêtes SQL comptées par les tests
+os.environ["CACHE_ENABLED"] = "false"
+os.environ.setdefault("ENVIRONEMENT", "LOCAL")
+
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    """Moteur sans pool sur la base configurée par PG_* ; les tests sont ignorés si elle est injoignable.
+
+    Chaque test tourne dans sa propre boucle (asyncio.run) : les connexions ne
+    doivent pas survivre d'un test à l'autre, d'où le NullPool."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+    from sqlalchemy.sql import text
+
+    import database
+
+    engine = create_async_engine(database.DATABASE_URL, poolclass=NullPool)
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1 FROM playerz.groupes LIMIT 1"))
+
+    try:
+        asyncio.run(ping())
+    except Exception as e:
+        pytest.skip(f"PostgreSQL indisponible : {e}")
+    return engine
@@ -0,0 +1,64 @@
+import asyncio
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+import database
+import main
+from benchmarks.run import QueryCounter
+
+ADD_GROUPES_QUERY = text(
+    """
+    WITH new_players AS (
+        INSERT INTO playerz.players (pseudo)
+        SELECT 'test-player-' || n FROM generate_series(1, :count * 2) AS n
+        RETURNING id
+    ), new_groupes AS (
+        INSERT INTO playerz.groupes (name)
+        SELECT 'test-groupe-' || n FROM generate_series(1, :count) AS n
+        RETURNING id
+    )
+    INSERT INTO playerz.player_groupes (player_id, groupe_id)
+    SELECT p.id, g.id
+    FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM new_players) p
+    JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n FROM new_groupes) g ON (p.n + 1) / 2 = g.n
+    """
+)
+
+
+async def list_groupes_statements(pg_engine, group_counts: list) -> list:
+    """Instructions SQL exécutées par GET /groupes/ après l'ajout de chaque lot de groupes.
+
+    Tout se passe dans une transaction annulée à la fin : la base n'est pas modifiée."""
+    counter = QueryCounter(pg_engine)
+    statements = []
+    async with pg_engine.connect() as conn:
+        transaction = await conn.begin()
+        session = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+
+        async def read_db():
+            yield session
+
+        main.app.dependency_overrides[database.get_read_db] = read_db
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="https://test") as client:
+                for count in group_counts:
+                    await conn.execute(ADD_GROUPES_QUERY, {"count": count})
+                    before = counter.count
+                    response = await client.get("/groupes/")
+                    assert response.status_code == 200
+                    assert response.json()["message"] == "SUCCES"
+                    statements.append(counter.count - before)
+        finally:
+            main.app.dependency_overrides.pop(database.get_read_db, None)
+            await session.close()
+            await transaction.rollback()
+    return statements
+
+
+def test_list_groupes_query_count_does_not_grow_with_groups(pg_engine):
+    # 1 groupe, puis 50 : les membres sont chargés en une requête pour tous les groupes
+    one_groupe, fifty_groupes = asyncio.run(list_groupes_statements(pg_engine, [1, 49]))
+    assert one_groupe == fifty_groupes <= 2
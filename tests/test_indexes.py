@@ -0,0 +1,15 @@
+import asyncio
+
+from cores.migrations import HOT_QUERIES, check_indexes, migrate
+
+
+async def migrate_and_explain(pg_engine) -> dict:
+    await migrate(pg_engine)
+    return await check_indexes(pg_engine)
+
+
+def test_hot_queries_use_an_index(pg_engine):
+    report = asyncio.run(migrate_and_explain(pg_engine))
+    assert set(report) == set(HOT_QUERIES)
+    without_index = {name: plan for name, (uses_index, plan) in report.items() if not uses_index}
+    assert not without_index, without_index
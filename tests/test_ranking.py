@@ -0,0 +1,111 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.sql import text
+
+import database
+from cores.ranking import TOURNAMENT_RANKING_QUERY, RankingEngine, TournamentStandings
+from cores.serialization import rows_to_dicts
+
+MATCH_COLUMNS = ("id", "session_id", "status", "t1j1", "t1j2", "t2j1", "t2j2", "score_team_one", "score_team_two")
+
+
+def test_delta_counts_a_player_twice_in_a_team_like_rebuild():
+    match = {"id": 1, "status": "Terminé", "t1j1": 1, "t1j2": 1, "t2j1": 2, "t2j2": 3,
+             "score_team_one": 10, "score_team_two": 4}
+    rebuilt = TournamentStandings(1, {1: "a", 2: "b", 3: "c"})
+    rebuilt.rebuild([match])
+    incremental = TournamentStandings(1, {1: "a", 2: "b", 3: "c"})
+    incremental.set_match(1, match)
+    assert incremental.stats.tolist() == rebuilt.stats.tolist()
+    assert incremental.ranking()[0]["played"] == 2 and incremental.ranking()[0]["points_for"] == 20
+
+
+INSERT_PLAYERS_QUERY = text(
+    "INSERT INTO playerz.players (pseudo) SELECT 'test-ranking-' || n FROM generate_series(1, 6) AS n RETURNING id"
+)
+INSERT_MATCH_QUERY = text(
+    """
+    INSERT INTO playerz.matches (session_id, status, t1j1, t1j2, t2j1, t2j2, score_team_one, score_team_two)
+    VALUES (:session_id, :status, :t1j1, :t1j2, :t2j1, :t2j2, :score_team_one, :score_team_two)
+    """
+)
+UPDATE_MATCH_QUERY = text(
+    """
+    UPDATE playerz.matches SET status = :status, score_team_one = :score_team_one, score_team_two = :score_team_two
+    WHERE id = :id
+    RETURNING id, session_id, status, t1j1, t1j2, t2j1, t2j2, score_team_one, score_team_two
+    """
+)
+
+
+async def compare_rankings(pg_engine, monkeypatch) -> list:
+    """(classement SQL, classement du moteur) après le chargement, après des deltas, puis après un rechargement.
+
+    Tout se passe dans une transaction annulée à la fin : la base n'est pas modifiée."""
+    comparisons = []
+    async with pg_engine.connect() as conn:
+        transaction = await conn.begin()
+        session = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+        # Le moteur charge depuis le primaire : ses sessions voient la transaction du test
+        monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(
+            bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint"
+        ))
+        try:
+            p1, p2, p3, p4, p5, p6 = (await conn.execute(INSERT_PLAYERS_QUERY)).scalars().all()
+            tournament_id = (await conn.execute(
+                text("INSERT INTO playerz.tournaments (name) VALUES ('test-ranking') RETURNING id")
+            )).scalar()
+            # p5 et p6 ne sont pas inscrits : p5 joue un match compté, p6 seulement un match non commencé
+            await conn.execute(
+                text("INSERT INTO playerz.tournament_players (tournament_id, player_id) VALUES (:t, :p)"),
+                [{"t": tournament_id, "p": p} for p in (p1, p2, p3, p4)],
+            )
+            session_id = (await conn.execute(
+                text("INSERT INTO playerz.sessions (tournament_id, reference) VALUES (:t, 's1') RETURNING id"),
+                {"t": tournament_id},
+            )).scalar()
+            matches = [
+                ("Terminé", p1, p2, p3, p4, 21, 15),
+                ("Terminé", p1, p1, p3, None, 10, 10),
+                ("En cours", p2, p5, p4, p3, 8, 12),
+                ("Non commencé", p6, p2, p1, p4, None, None),
+                ("Terminé", p3, p4, p1, p2, None, 5),
+            ]
+            await conn.execute(INSERT_MATCH_QUERY, [
+                dict(zip(MATCH_COLUMNS[1:], (session_id, *match))) for match in matches
+            ])
+
+            async def sql_ranking():
+                result = await session.execute(TOURNAMENT_RANKING_QUERY, {"id": tournament_id})
+                return rows_to_dicts(result, result.fetchall())
+
+            engine = RankingEngine()
+            comparisons.append((await sql_ranking(), await engine.get_ranking(tournament_id)))
+
+            # Deltas : scores modifiés, joueur en double dans une équipe, match repassé non commencé
+            # (p5 n'a alors plus de match compté), puis premier match compté de p6 (pseudo à relire)
+            match_ids = (await conn.execute(
+                text("SELECT id FROM playerz.matches WHERE session_id = :s ORDER BY id"), {"s": session_id}
+            )).scalars().all()
+            updates = [
+                (match_ids[0], "Terminé", 15, 21),
+                (match_ids[1], "Terminé", 11, 3),
+                (match_ids[2], "Non commencé", 8, 12),
+                (match_ids[3], "Terminé", 7, 7),
+            ]
+            for match_id, status, score_one, score_two in updates:
+                row = (await conn.execute(UPDATE_MATCH_QUERY, {
+                    "id": match_id, "status": status, "score_team_one": score_one, "score_team_two": score_two,
+                })).fetchone()
+                engine.apply_match(dict(zip(MATCH_COLUMNS, row)))
+                comparisons.append((await sql_ranking(), await engine.get_ranking(tournament_id)))
+        finally:
+            await session.close()
+            await transaction.rollback()
+    return comparisons
+
+
+def test_engine_ranking_matches_sql_function(pg_engine, monkeypatch):
+    for sql, engine in asyncio.run(compare_rankings(pg_engine, monkeypatch)):
+        assert engine == sql
@@ -0,0 +1,61 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from cores.scheduling import round_robin, split_into_sessions, swiss_pairing
+
+TEAM_COUNTS = [2, 3, 4, 5, 8, 9, 16, 17, 511, 512]
+
+
+def assert_no_team_twice(pairs: np.ndarray):
+    teams = pairs.ravel()
+    assert len(teams) == len(set(teams.tolist()))
+
+
+@pytest.mark.parametrize("nb_teams", TEAM_COUNTS)
+def test_round_robin_every_pair_meets_exactly_once(nb_teams):
+    rounds = round_robin(nb_teams)
+    met = [frozenset(pair) for pair in rounds.reshape(-1, 2).tolist()]
+    assert len(met) == len(set(met))
+    assert set(met) == {frozenset(pair) for pair in combinations(range(nb_teams), 2)}
+
+
+@pytest.mark.parametrize("nb_teams", TEAM_COUNTS)
+def test_round_robin_no_team_twice_in_a_round(nb_teams):
+    rounds = round_robin(nb_teams)
+    assert rounds.shape == (nb_teams - 1 + nb_teams % 2, nb_teams // 2, 2)
+    for round_pairs in rounds:
+        assert_no_team_twice(round_pairs)
+
+
+@pytest.mark.parametrize("nb_teams", [9, 16])
+@pytest.mark.parametrize("matches_per_session", [1, 3, 8])
+def test_sessions_are_capped_and_come_from_one_round(nb_teams, matches_per_session):
+    rounds = round_robin(nb_teams)
+    sessions = split_into_sessions(rounds, matches_per_session)
+    assert sum(len(session) for session in sessions) == rounds.shape[0] * rounds.shape[1]
+    for session in sessions:
+        assert 0 < len(session) <= matches_per_session
+        assert_no_team_twice(session)
+
+
+def test_sessions_respect_max_sessions():
+    assert len(split_into_sessions(round_robin(16), 4, max_sessions=5)) == 5
+
+
+@pytest.mark.parametrize("nb_teams", [2, 7, 8, 33])
+def test_swiss_pairs_each_team_once_with_a_single_bye(nb_teams):
+    scores = np.random.default_rng(nb_teams).integers(0, 5, nb_teams)
+    pairs = swiss_pairing(scores)
+    assert pairs.shape == (nb_teams // 2, 2)
+    assert_no_team_twice(pairs)
+
+
+def test_swiss_pairs_close_scores_and_avoids_rematches():
+    scores = [3, 3, 2, 2, 1, 1]
+    assert sorted(map(sorted, swiss_pairing(scores).tolist())) == [[0, 1], [2, 3], [4, 5]]
+    # 0 et 1 se sont déjà rencontrés : 0 joue la suivante disponible
+    pairs = swiss_pairing(scores, played=[(0, 1)])
+    assert [0, 1] not in map(sorted, pairs.tolist())
+    assert_no_team_twice(pairs)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from cores.teams import balanced_pairs, strength_gap
+
+
+def pairings(players: tuple):
+    """Toutes les répartitions en paires d'un nombre pair de joueurs."""
+    if not players:
+        yield []
+        return
+    first, rest = players[0], players[1:]
+    for i, partner in enumerate(rest):
+        for others in pairings(rest[:i] + rest[i + 1:]):
+            yield [(first, partner), *others]
+
+
+def exhaustive_best(strengths: np.ndarray) -> tuple:
+    """(plus petit écart, plus petite variance des forces d'équipe) parmi toutes les répartitions."""
+    players = tuple(range(len(strengths)))
+    solos = players if len(players) % 2 else (None,)
+    best_gap, best_variance = np.inf, np.inf
+    for solo in solos:
+        for pairs in pairings(tuple(p for p in players if p != solo)):
+            pairs = np.array(pairs)
+            best_gap = min(best_gap, strength_gap(strengths, pairs))
+            best_variance = min(best_variance, strengths[pairs].sum(axis=1).var())
+    return best_gap, best_variance
+
+
+@pytest.mark.parametrize("seed", range(400))
+def test_balanced_pairs_is_optimal_against_exhaustive_search(seed):
+    rng = np.random.default_rng(seed)
+    strengths = rng.integers(800, 1300, rng.integers(2, 10)).astype(float)
+    pairs, solo = balanced_pairs(strengths)
+
+    used = pairs.ravel().tolist() + ([solo] if solo is not None else [])
+    assert sorted(used) == list(range(len(strengths)))
+    best_gap, best_variance = exhaustive_best(strengths)
+    assert strength_gap(strengths, pairs) == pytest.approx(best_gap)
+    if len(strengths) % 2 == 0:
+        assert strengths[pairs].sum(axis=1).var() == pytest.approx(best_variance)